@@ -0,0 +1,49 @@
+#任务归档后台任务：定期把各分片中 posted_at 早于归档期限的任务分批移入 task_archive（见 ArchiveRepository）
+#水位：每个分片先把归档水位提高到 cutoff 并提交，再分批移动数据，读取按水位决定是否查询归档表；
+#生命周期：main.lifespan 启动 run() 后台任务（ARCHIVE_AFTER_DAYS 为 0（默认）时不启动），关闭时取消；
+#也可手动执行：python -m backend.manage archive-tasks
+
+import asyncio
+import logging
+from datetime import date
+
+from backend.config import settings
+from backend.database import shard_router
+from backend.repositories.archive_repo import ArchiveRepository, archive_cutoff
+
+logger = logging.getLogger(__name__)
+
+
+# 归档所有分片中早于 cutoff（默认为当前归档期限）的任务，返回归档的总行数
+async def archive_old_tasks(cutoff: date | None = None, batch_size: int = settings.ARCHIVE_BATCH_SIZE) -> int:
+    cutoff = cutoff or archive_cutoff()
+    if cutoff is None:
+        return 0
+
+    archived = 0
+    for shard_id in range(shard_router.shard_count):
+        async with shard_router.session_maker(shard_id)() as db_session:
+            archive_repo = ArchiveRepository(db_session)
+            # 先提交水位：移动数据期间和之后的读取都会合并查询归档表
+            await archive_repo.raise_watermark(cutoff)
+            await db_session.commit()
+            while True:
+                moved = await archive_repo.archive_batch(cutoff, batch_size)
+                archived += moved
+                if moved < batch_size:
+                    break
+                # 批次之间让出事件循环和写锁，避免长时间阻塞任务写入
+                await asyncio.sleep(settings.ARCHIVE_BATCH_PAUSE_SECONDS)
+    return archived
+
+
+# 后台任务：启动后立即执行一次，之后每隔 interval 秒执行一次，直到被取消
+async def run(interval: float) -> None:
+    while True:
+        try:
+            archived = await archive_old_tasks()
+            if archived:
+                logger.info("Archived %d task(s) posted before %s", archived, archive_cutoff())
+        except Exception:
+            logger.exception("Failed to archive old tasks, will retry")
+        await asyncio.sleep(interval)
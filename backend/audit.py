@@ -0,0 +1,93 @@
+#登录时间等审计字段的延迟批量写入（write-behind）：请求路径上只记入内存，后台任务定期用批量 UPDATE 写入用户目录
+#记录：登录（密码 / Google）更新 user.last_login，刷新令牌更新 user.last_token_refresh；
+#合并：同一用户同一字段在一个周期内只保留最新时间，登录风暴时数据库写入次数与登录次数无关；
+#生命周期：main.lifespan 启动 run() 后台任务，关闭时停止并执行最后一次 flush()；
+#写入失败：数据库暂时不可用（OperationalError，如锁超时、连接断开）或被取消时数据放回缓冲区等待下次重试，
+#连续失败 MAX_FLUSH_RETRIES 次后丢弃；其他错误重试也不会成功，记录日志后直接丢弃该批；
+#进程异常退出时最多丢失一个周期（AUDIT_FLUSH_INTERVAL_SECONDS）的记录
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy.exc import OperationalError
+
+from backend.database import async_session_maker
+from backend.repositories.user_repo import UserRepository
+
+logger = logging.getLogger(__name__)
+
+# 允许延迟写入的 user 表字段
+AUDIT_FIELDS = ("last_login", "last_token_refresh")
+
+# 暂时性错误连续重试的次数上限
+MAX_FLUSH_RETRIES = 5
+
+
+class AuditBuffer:
+    def __init__(self):
+        # 字段 -> {用户ID: 最新时间}
+        self._pending: dict[str, dict[int, datetime]] = {field: {} for field in AUDIT_FIELDS}
+        self._failures = 0  # 连续写入失败的次数
+
+    # 记录一次审计事件（仅写内存，不访问数据库）
+    def record(self, field: str, user_id: int, at: datetime | None = None) -> None:
+        at = at or datetime.now(timezone.utc)
+        pending = self._pending[field]
+        if user_id not in pending or pending[user_id] < at:
+            pending[user_id] = at
+
+    def __len__(self) -> int:
+        return sum(len(pending) for pending in self._pending.values())
+
+    # 把缓冲区写入数据库（每个字段一条批量 UPDATE），返回写入的条数
+    async def flush(self) -> int:
+        batch, self._pending = self._pending, {field: {} for field in AUDIT_FIELDS}
+        if not any(batch.values()):
+            return 0
+        count = sum(len(values) for values in batch.values())
+
+        try:
+            async with async_session_maker() as db_session:
+                user_repo = UserRepository(db_session)
+                for field, values in batch.items():
+                    await user_repo.bulk_update_audit_field(field, values)
+                await db_session.commit()
+        except OperationalError:
+            # 数据库暂时不可用：放回缓冲区等待下次重试，连续失败过多时放弃
+            self._failures += 1
+            if self._failures > MAX_FLUSH_RETRIES:
+                self._failures = 0
+                logger.exception("Dropping %d audit record(s) after %d failed flushes", count, MAX_FLUSH_RETRIES + 1)
+                return 0
+            self._requeue(batch)
+            raise
+        except Exception:
+            # 其他错误（数据或代码问题）重试也不会成功，丢弃该批，避免每个周期重复失败
+            self._failures = 0
+            logger.exception("Dropping %d audit record(s) that cannot be written", count)
+            return 0
+        except BaseException:
+            # 被取消：放回缓冲区，由关闭时的最后一次 flush 写入
+            self._requeue(batch)
+            raise
+        self._failures = 0
+        return count
+
+    # 把未写入的记录放回缓冲区（期间新记录的时间更新时以新记录为准）
+    def _requeue(self, batch: dict[str, dict[int, datetime]]) -> None:
+        for field, values in batch.items():
+            for user_id, at in values.items():
+                self.record(field, user_id, at)
+
+    # 后台任务：每隔 interval 秒写入一次，直到被取消
+    async def run(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush %d audit record(s), will retry", len(self))
+
+
+audit_buffer = AuditBuffer()
@@ -2,29 +2,43 @@
 #令牌分层：访问令牌（短期）+ 刷新令牌（长期），平衡安全性和用户体验；
 #依赖校验：get_current_user作为依赖，所有需要登录的接口自动校验令牌；
 #异常处理：细分 JWT 错误类型（过期、无效），返回精准提示
+#读写分离：当前用户查询只读，使用读库会话
+#请求合并：同一进程内相同用户（令牌 sub）的并发校验共享一次用户查询（见 backend/singleflight.py）
+#分片会话：get_shard_session / get_shard_read_session 依赖当前用户，返回其任务数据所在分片的会话
 
+from collections.abc import AsyncGenerator
 from datetime import datetime, timedelta
 from typing import Any
 
 import jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.config import settings
-from backend.database import get_async_session
+from backend.database import open_read_session, open_shard_read_session, open_shard_session, should_read_primary
 from backend.models import User
 from backend.repositories.user_repo import UserRepository
+from backend.singleflight import SingleFlight
 
 # 定义OAuth2密码模式：指定令牌获取接口，用于Swagger文档自动识别
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="user/jwt/create/", scheme_name="JWT")  # important path to get token
 
+# 按用户名/邮箱查询用户的并发调用合并（key：(sub, 是否读主库)）
+_user_lookups: SingleFlight[User | None] = SingleFlight()
+
+
+# 查询用户：使用独立的只读会话，不依赖发起合并的那个请求的生命周期
+async def _load_user(request: Request, username: str) -> User | None:
+    async with open_read_session(request) as db_session:
+        return await UserRepository(db_session).get_user_by_username_or_email(username)
+
+
 # 获取当前登录用户（依赖函数，FastAPI注入）
 async def get_current_user(
+    request: Request,
     access_token: str = Depends(oauth2_scheme),
-    db_session: AsyncSession = Depends(get_async_session),
 ) -> User:
-    user_repo = UserRepository(db_session)
     try:
         # 解码JWT令牌：验证签名和算法
         payload = jwt.decode(
@@ -51,8 +65,11 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # 根据用户名/邮箱查询用户
-    user: User | None = await user_repo.get_user_by_username_or_email(username)
+    # 根据用户名/邮箱查询用户（相同用户的并发请求共享一次查询）
+    user: User | None = await _user_lookups.do(
+        (username, should_read_primary(request)),
+        lambda: _load_user(request, username),
+    )
 
     if not user:
         raise HTTPException(
@@ -71,6 +88,24 @@ async def get_current_user(
     return user
 
 
+# 当前用户所在分片的写会话（任务相关写接口使用）
+async def get_shard_session(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+) -> AsyncGenerator[AsyncSession, None]:
+    async with open_shard_session(request, current_user.shard_id, current_user.shard_locked) as session:
+        yield session
+
+
+# 当前用户所在分片的只读会话（任务相关读接口使用）
+async def get_shard_read_session(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+) -> AsyncGenerator[AsyncSession, None]:
+    async with open_shard_read_session(request, current_user.shard_id) as session:
+        yield session
+
+
 # 访问令牌（Access Token）：短期有效，用于日常API请求认证 （访问令牌泄露后影响时间短）
 def create_access_token(subject: str | Any, expires_delta: int = None) -> str:
      # 设置过期时间：默认使用配置中的30分钟，否则使用传入的过期时间
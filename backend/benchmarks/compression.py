@@ -0,0 +1,70 @@
+#压缩基准：对不同长度的 DisplayTaskSchema 列表，比较各编码的压缩耗时与节省的字节数，用于确定 COMPRESSION_MINIMUM_SIZE
+#运行：python -m backend.benchmarks.compression [--repeat 200]
+#输出每种列表长度下 JSON / MessagePack 原始大小，以及各编码压缩后的大小、压缩率和单次压缩耗时（微秒）
+
+import argparse
+import json
+import time
+from datetime import datetime
+
+import msgpack
+
+from backend.middleware.compression import ENCODERS
+from backend.schemas import DisplayTaskSchema
+
+LIST_SIZES = (1, 3, 5, 10, 20, 50, 100, 500, 1000)
+
+
+# 构造接近真实数据的任务列表（文本长度不一、部分已完成）
+def sample_tasks(count: int) -> list[dict]:
+    tasks = [
+        DisplayTaskSchema(
+            id=1099511627776 + index,
+            priority=index,
+            text=f"Task {index}: " + "review the weekly report and reply " * (index % 3 + 1),
+            completed=index % 2 == 0,
+            created_at=datetime(2026, 10, 19, 9, index % 60, index % 60),
+            recurrence_id=None if index % 4 else index,
+        )
+        for index in range(count)
+    ]
+    return [task.model_dump(mode="json") for task in tasks]
+
+
+def measure(encoder_factory, payload: bytes, repeat: int) -> tuple[int, float]:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        encoder = encoder_factory()
+        compressed = encoder.compress(payload) + encoder.finish()
+    elapsed = (time.perf_counter() - started) / repeat
+    return len(compressed), elapsed * 1_000_000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.benchmarks.compression")
+    parser.add_argument("--repeat", type=int, default=200, help="compressions per measurement")
+    args = parser.parse_args()
+
+    header = ("tasks", "format", "bytes", "encoding", "out", "ratio", "us", "us/KB saved")
+    widths = (5, 7, 7, 8, 7, 6, 8, 11)
+    print(" ".join(f"{title:>{width}}" for title, width in zip(header, widths)))
+    for count in LIST_SIZES:
+        tasks = sample_tasks(count)
+        payloads = {
+            "json": json.dumps(tasks, separators=(",", ":")).encode("utf-8"),
+            "msgpack": msgpack.packb(tasks, use_bin_type=True),
+        }
+        for payload_format, payload in payloads.items():
+            for encoding, encoder_factory in ENCODERS.items():
+                size, micros = measure(encoder_factory, payload, args.repeat)
+                saved = len(payload) - size
+                cost = f"{micros / (saved / 1024):.1f}" if saved > 0 else "-"
+                print(
+                    f"{count:>5} {payload_format:>7} {len(payload):>7} {encoding:>8} {size:>7} "
+                    f"{size / len(payload):>6.2f} {micros:>8.1f} {cost:>11}",
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
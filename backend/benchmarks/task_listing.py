@@ -0,0 +1,91 @@
+#任务列表读取基准：比较 get_tasks_by_date 的 ORM 模式与精简模式（lean=True，仅查询需要的列）
+#运行：python -m backend.benchmarks.task_listing [--tasks 1000] [--repeat 20]
+#在临时 SQLite 数据库中为一个用户写入同一天的任务，分别统计查询 + 响应序列化的耗时、tracemalloc 峰值内存和分配块数
+
+import argparse
+import asyncio
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+from pathlib import Path
+
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.models import User, metadata
+from backend.repositories.task_repo import TaskRepository
+from backend.schemas import DisplayTaskSchema, ImportTaskSchema
+
+POSTED_AT = date(2026, 10, 19)
+response_adapter = TypeAdapter(list[DisplayTaskSchema])
+
+
+# 与 FastAPI 处理 response_model 的方式一致：按属性校验后再输出 JSON
+async def load_and_serialize(session_maker, user: User, lean: bool) -> bytes:
+    async with session_maker() as db_session:
+        tasks = await TaskRepository(db_session).get_tasks_by_date(POSTED_AT, user, lean=lean)
+        return response_adapter.dump_json(response_adapter.validate_python(tasks, from_attributes=True))
+
+
+async def measure(session_maker, user: User, lean: bool, repeat: int) -> tuple[float, int, int]:
+    # 预热：建立连接、编译语句缓存
+    await load_and_serialize(session_maker, user, lean)
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await load_and_serialize(session_maker, user, lean)
+    elapsed_ms = (time.perf_counter() - started) / repeat * 1000
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    await load_and_serialize(session_maker, user, lean)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    return elapsed_ms, peak, blocks
+
+
+async def run(task_count: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(directory) / 'bench.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(metadata.create_all)
+        session_maker = async_sessionmaker(engine, expire_on_commit=False, info={"shard_id": 0})
+
+        user = User(id=1)
+        async with session_maker() as db_session:
+            await TaskRepository(db_session).bulk_create_tasks(
+                [
+                    ImportTaskSchema(
+                        text=f"Task {index}",
+                        priority=index,
+                        posted_at=POSTED_AT,
+                        completed=index % 2 == 0,
+                    )
+                    for index in range(task_count)
+                ],
+                user,
+            )
+            await db_session.commit()
+
+        print(f"{task_count} tasks, {repeat} runs")
+        print(f"{'mode':>5} {'ms/request':>10} {'peak KiB':>9} {'new blocks':>10}")
+        for mode, lean in (("orm", False), ("lean", True)):
+            elapsed_ms, peak, blocks = await measure(session_maker, user, lean, repeat)
+            print(f"{mode:>5} {elapsed_ms:>10.2f} {peak / 1024:>9.1f} {blocks:>10}")
+        await engine.dispose()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.benchmarks.task_listing")
+    parser.add_argument("--tasks", type=int, default=1000, help="tasks on the listed day")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per mode")
+    args = parser.parse_args()
+    asyncio.run(run(args.tasks, args.repeat))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
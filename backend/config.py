@@ -31,6 +31,59 @@ class GlobalSettings(BaseSettings):
     DB_NAME: str = "postgres"
     # specify single database url
     DATABASE_URL: str | None = None
+    # 读库（只读副本）地址，未配置时读写使用同一数据库
+    READ_DATABASE_URL: str | None = None
+    READ_POOL_SIZE: int = 5  # 读引擎连接池大小
+    READ_YOUR_WRITES_SECONDS: float = 5  # 同一令牌提交写操作后，多少秒内的读请求改走主库（0 表示关闭）
+    # 任务数据分片：主库为 0 号分片（同时存放用户目录），这里列出额外分片 1..N 的地址
+    #如 ["sqlite+aiosqlite:///backend/sql_app_shard_1.db"]；为空时不分片，所有数据都在主库
+    SHARD_DATABASE_URLS: list[str] = []
+    SHARD_READ_DATABASE_URLS: list[str] = []  # 额外分片对应的只读副本地址（可选，按顺序对应）
+
+    # 任务导入/导出：每批处理的行数（导出时服务端游标每次读取的行数、导入时每条多行 INSERT 的行数）
+    EXPORT_CHUNK_SIZE: int = 500
+    IMPORT_CHUNK_SIZE: int = 500
+    IMPORT_MAX_BYTES: int = 10 * 1024 * 1024  # 导入文件大小上限（整个导入在一个事务内完成，期间持有分片写锁）
+
+    # 日期区间查询允许的最大天数（限制重复任务展开的规模）
+    MAX_TASK_RANGE_DAYS: int = 366
+
+    # 增量同步（GET /task/changes/）每页返回的最大变更数
+    SYNC_PAGE_SIZE: int = 500
+
+    # 响应压缩阈值（字节）：小于该大小的响应不压缩。基准（python -m backend.benchmarks.compression）显示
+    #单个任务（约 150 字节）压缩后几乎不变小，3 个任务（约 600 字节）起可节省约 70%，压缩耗时 20-40 微秒
+    COMPRESSION_MINIMUM_SIZE: int = 512
+
+    # 准入控制（每个进程）：各路由类别的最大并发数、最大排队数、排队超时（秒），超出后返回503
+    AUTH_MAX_CONCURRENCY: int = 4  # 登录/注册（bcrypt）
+    AUTH_MAX_QUEUE: int = 32
+    AUTH_QUEUE_TIMEOUT_SECONDS: float = 3
+    TASK_READ_MAX_CONCURRENCY: int = 64
+    TASK_READ_MAX_QUEUE: int = 256
+    TASK_READ_QUEUE_TIMEOUT_SECONDS: float = 1
+    TASK_WRITE_MAX_CONCURRENCY: int = 16
+    TASK_WRITE_MAX_QUEUE: int = 128
+    TASK_WRITE_QUEUE_TIMEOUT_SECONDS: float = 2
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1  # 被拒绝请求的 Retry-After
+    # 运行指标接口（/metrics/）：请求头 X-Metrics-Token 需与 METRICS_TOKEN 一致，未配置令牌时接口不可用（404）
+    METRICS_TOKEN: str | None = None
+
+    # 按需性能分析（cProfile）：关闭时不注册中间件；请求头 X-Profile 需与 PROFILING_TOKEN 一致，或按比例随机采样
+    PROFILING_ENABLED: bool = False
+    PROFILING_TOKEN: str | None = None
+    PROFILING_SAMPLE_RATE: float = 0.0  # 0~1，如 0.001 表示分析千分之一的请求
+    PROFILING_DIR: str | None = None  # 分析结果目录，默认 backend/profiles
+
+    # 登录时间等审计字段的批量写入周期（秒）
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = 10
+
+    # 任务归档：posted_at 早于 ARCHIVE_AFTER_DAYS 天前的任务移入 task_archive（默认 0，不归档）
+    #归档任务只读：修改、删除返回 409，按需开启（如 365）
+    ARCHIVE_AFTER_DAYS: int = 0
+    ARCHIVE_BATCH_SIZE: int = 500  # 每批移动的任务数（一个事务）
+    ARCHIVE_BATCH_PAUSE_SECONDS: float = 0.05  # 批次之间的间隔
+    ARCHIVE_INTERVAL_SECONDS: float = 60 * 60  # 后台归档任务的执行周期
 
 # 测试环境配置（继承基础配置，可覆写）
 class TestSettings(GlobalSettings):
@@ -5,27 +5,264 @@
 #异步引擎：使用aiosqlite驱动，适配 FastAPI 的异步特性；
 #会话管理：通过生成器自动释放会话，避免连接泄露；
 #路径处理：使用Path保证跨平台兼容性（Windows/Linux 路径格式统一）
+#读写分离：写操作走主库引擎（get_async_session），只读接口走读引擎（get_read_session）；
+#读引擎可以是只读副本（READ_DATABASE_URL），未配置时为同一 SQLite 文件上的只读连接池（WAL 模式下读写互不阻塞）；
+#读己之写：请求头 X-Read-Your-Writes 或同一令牌最近刚提交过写操作时，读请求改走主库，避免副本延迟读到旧数据
+#分片：任务相关数据按用户分布到多个数据库（shard_router），每个分片有独立的写锁，不同用户的任务写入可并行；
+#主库即 0 号分片，同时作为用户目录（user.shard_id 记录用户所在分片）
 
+import time
+import zlib
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from typing import AsyncGenerator
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.pool import NullPool
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 from pathlib import Path
 
+from fastapi import HTTPException, Request, status
+
+from backend.config import settings
+from backend.models import IdCounter
+
 # 获取backend目录路径（保证数据库文件路径统一）
 BACKEND_DIR = Path(__file__).parent
-# 拼接SQLite数据库文件路径（存储在backend目录下的sql_app.db）
-DATABASE_URL = f"sqlite+aiosqlite:///{BACKEND_DIR / 'sql_app.db'}"
-
-# 创建异步引擎（适配SQLite）
-engine = create_async_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},  # SQLite必需参数：允许异步线程访问
-    poolclass=NullPool,  # 避免SQLite连接池问题
-    echo=True  # 可选：显示SQL日志，方便调试
+# 拼接SQLite数据库文件路径（存储在backend目录下的sql_app.db）；配置了 DATABASE_URL 时以配置为准
+DATABASE_URL = settings.DATABASE_URL or f"sqlite+aiosqlite:///{BACKEND_DIR / 'sql_app.db'}"
+# 读库地址：未配置副本时读写使用同一数据库
+READ_DATABASE_URL = settings.READ_DATABASE_URL or DATABASE_URL
+
+# 每个分片独占的主键区间大小：k 号分片新建行的 id 落在 (k * SPAN, (k + 1) * SPAN]，
+#用户迁移到其他分片时保留原 id 也不会与目标分片新生成的 id 冲突（2**40 * 8192 仍在 JS 安全整数范围内）
+SHARD_ID_SPAN = 2**40
+
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+# SQLite 主库开启 WAL：读连接与写事务并发执行，互不阻塞（WAL 设置持久保存在数据库文件中）
+def _enable_wal(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")  # WAL 模式下的推荐设置，减少 fsync 次数
+    cursor.close()
+
+
+# SQLite 读连接设置为只读，防止只读会话被误用于写入
+def _set_query_only(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+# 创建写引擎（适配SQLite）
+def _create_write_engine(url: str) -> AsyncEngine:
+    write_engine = create_async_engine(
+        url,
+        connect_args={"check_same_thread": False} if _is_sqlite(url) else {},  # SQLite必需参数：允许异步线程访问
+        poolclass=NullPool,  # 避免SQLite连接池问题
+        echo=True  # 可选：显示SQL日志，方便调试
+    )
+    if _is_sqlite(url):
+        event.listen(write_engine.sync_engine, "connect", _enable_wal)
+    return write_engine
+
+
+# 创建只读引擎：使用连接池复用连接，读能力可独立于写入扩展
+def _create_read_engine(url: str) -> AsyncEngine:
+    read_only_engine = create_async_engine(
+        url,
+        connect_args={"check_same_thread": False} if _is_sqlite(url) else {},
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.READ_POOL_SIZE,
+        echo=True
+    )
+    if _is_sqlite(url):
+        event.listen(read_only_engine.sync_engine, "connect", _set_query_only)
+    return read_only_engine
+
+
+# 主库（0 号分片 + 用户目录）引擎
+engine = _create_write_engine(DATABASE_URL)
+read_engine = _create_read_engine(READ_DATABASE_URL)
+
+
+# 写会话类：提交成功后在 session.info 中打标记，用于“读己之写”判断
+class WriteSession(Session):
+    pass
+
+
+@event.listens_for(WriteSession, "after_commit")
+def _mark_committed(session):
+    session.info["committed"] = True
+
+
+# session.info["shard_id"] 记录会话所属分片，仓储层据此生成分片内的主键
+async_session_maker = async_sessionmaker(
+    engine,
+    expire_on_commit=False,
+    sync_session_class=WriteSession,
+    info={"shard_id": 0},
 )
-async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
+read_session_maker = async_sessionmaker(read_engine, expire_on_commit=False, info={"shard_id": 0})
+
+
+# 分片路由：根据用户所在分片返回对应数据库的会话工厂
+class ShardRouter:
+    def __init__(self, write_urls: list[str], read_urls: list[str]):
+        self.write_engines = [engine]
+        self.read_engines = [read_engine]
+        self.write_session_makers = [async_session_maker]
+        self.read_session_makers = [read_session_maker]
+
+        for index, url in enumerate(write_urls, start=1):
+            read_url = read_urls[index - 1] if index - 1 < len(read_urls) else url
+            shard_write_engine = _create_write_engine(url)
+            shard_read_engine = _create_read_engine(read_url)
+            self.write_engines.append(shard_write_engine)
+            self.read_engines.append(shard_read_engine)
+            self.write_session_makers.append(
+                async_sessionmaker(
+                    shard_write_engine,
+                    expire_on_commit=False,
+                    sync_session_class=WriteSession,
+                    info={"shard_id": index},
+                ),
+            )
+            self.read_session_makers.append(
+                async_sessionmaker(shard_read_engine, expire_on_commit=False, info={"shard_id": index}),
+            )
+
+    @property
+    def shard_count(self) -> int:
+        return len(self.write_engines)
 
-# 数据库会话依赖函数（FastAPI注入用）
-async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    # 新用户分配分片：按用户名哈希均匀分布（之后以 user.shard_id 为准，可通过迁移工具调整）
+    def shard_for_new_user(self, username: str) -> int:
+        return zlib.crc32(username.encode("utf-8")) % self.shard_count
+
+    # 获取分片的会话工厂
+    def session_maker(self, shard_id: int, readonly: bool = False) -> async_sessionmaker[AsyncSession]:
+        if not 0 <= shard_id < self.shard_count:
+            raise ValueError(f"Unknown shard {shard_id}, {self.shard_count} shard(s) configured")
+        return self.read_session_makers[shard_id] if readonly else self.write_session_makers[shard_id]
+
+    # 释放所有分片的连接池
+    async def dispose(self) -> None:
+        for shard_engine in self.write_engines + self.read_engines:
+            await shard_engine.dispose()
+
+
+shard_router = ShardRouter(settings.SHARD_DATABASE_URLS, settings.SHARD_READ_DATABASE_URLS)
+
+# 最近提交过写操作的令牌 -> 提交时间（单进程内有效；多进程部署可由客户端通过请求头显式要求）
+_recent_writers: dict[str, float] = {}
+
+
+def _record_write(request: Request) -> None:
+    authorization = request.headers.get("Authorization")
+    if not authorization or settings.READ_YOUR_WRITES_SECONDS <= 0:
+        return
+    now = time.monotonic()
+    _recent_writers[authorization] = now
+    # 顺带清理过期记录，避免字典无限增长
+    if len(_recent_writers) > 10_000:
+        for key, written_at in list(_recent_writers.items()):
+            if now - written_at > settings.READ_YOUR_WRITES_SECONDS:
+                del _recent_writers[key]
+
+
+# 本次读请求是否应改走主库（读己之写）
+def should_read_primary(request: Request) -> bool:
+    if request.headers.get("X-Read-Your-Writes", "").lower() in ("1", "true"):
+        return True
+    written_at = _recent_writers.get(request.headers.get("Authorization", ""))
+    return written_at is not None and time.monotonic() - written_at <= settings.READ_YOUR_WRITES_SECONDS
+
+
+# 数据库会话依赖函数（FastAPI注入用）：写会话，连接主库
+async def get_async_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
     async with async_session_maker() as session:
-        yield session
\ No newline at end of file
+        yield session
+        if session.info.get("committed"):
+            _record_write(request)
+
+
+# 打开只读会话：默认连接读库，需要读己之写时改用主库
+@asynccontextmanager
+async def open_read_session(request: Request) -> AsyncIterator[AsyncSession]:
+    session_maker = async_session_maker if should_read_primary(request) else read_session_maker
+    async with session_maker() as session:
+        yield session
+
+
+# 只读会话依赖函数：GET 接口使用
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    async with open_read_session(request) as session:
+        yield session
+
+
+# 打开用户所在分片的写会话（供 auth.get_shard_session 依赖使用）
+#用户正在迁移分片时拒绝写入，避免迁移期间写入旧分片的数据丢失
+@asynccontextmanager
+async def open_shard_session(request: Request, shard_id: int, shard_locked: bool) -> AsyncIterator[AsyncSession]:
+    if shard_locked:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Account data is being migrated, please retry shortly",
+            headers={"Retry-After": "5"},
+        )
+    async with shard_router.session_maker(shard_id)() as session:
+        yield session
+        if session.info.get("committed"):
+            _record_write(request)
+
+
+# 打开用户所在分片的只读会话（供 auth.get_shard_read_session 依赖使用）
+@asynccontextmanager
+async def open_shard_read_session(request: Request, shard_id: int) -> AsyncIterator[AsyncSession]:
+    async with shard_router.session_maker(shard_id, readonly=not should_read_primary(request))() as session:
+        yield session
+
+
+# 在分片内预留 count 个连续的主键，返回第一个（调用方在同一事务中使用 first_id .. first_id + count - 1）
+#计数器行（id_counter）记录每张表在本分片已分配的最大 id，UPSERT ... RETURNING 一条语句完成递增：
+#SQLite 下该语句取得写锁后才读取计数器，PostgreSQL 下同一行的并发递增依次执行，并发写入不会分到相同的 id；
+#首次分配时以表中已有的最大 id 为起点（不分片时等价于 SQLite 默认的 max(rowid) + 1）；
+#shared_with：与 model 共用 id 空间的表（如任务归档表），起点取各表最大 id 中的较大者
+async def reserve_ids(model, db_session: AsyncSession, *shared_with, count: int = 1) -> int:
+    shard_id = db_session.info.get("shard_id", 0)
+    low, high = shard_id * SHARD_ID_SPAN, (shard_id + 1) * SHARD_ID_SPAN
+    max_ids = [
+        select(func.coalesce(func.max(table.id), low)).where(table.id > low, table.id <= high).scalar_subquery()
+        for table in (model, *shared_with)
+    ]
+    if len(max_ids) == 1:
+        start = max_ids[0]
+    else:
+        # 多参数 max() 在 SQLite 中为标量函数，PostgreSQL 中对应 greatest()
+        start = (func.greatest if db_session.bind.dialect.name == "postgresql" else func.max)(*max_ids)
+
+    statement = dialect_insert(db_session, IdCounter).values(
+        table_name=model.__tablename__,
+        last_id=start + count,
+        is_deleted=False,
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[IdCounter.table_name],
+        set_={"last_id": IdCounter.last_id + count, "updated_at": func.now()},
+    ).returning(IdCounter.last_id)
+    last_id = (await db_session.execute(statement)).scalar_one()
+    return last_id - count + 1
+
+
+# 按会话绑定的数据库方言返回 INSERT 构造器（支持 on_conflict_do_update 等 UPSERT 语法）
+#SQLite 与 PostgreSQL 的 insert() 提供相同的 ON CONFLICT 接口，调用方无需关心具体方言
+def dialect_insert(db_session: AsyncSession, model):
+    if db_session.bind.dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
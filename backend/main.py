@@ -3,22 +3,44 @@
 
 #初始化 FastAPI 应用，注册路由，配置跨域，启动时创建数据库表
 
-from contextlib import asynccontextmanager
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from backend.database import engine
-from backend.models import metadata
-from backend.routers import authentication, task, user
+from backend import archiver
+from backend.audit import audit_buffer
+from backend.config import settings
+from backend.database import shard_router
+from backend.middleware.admission import AdmissionControlMiddleware
+from backend.middleware.compression import CompressionMiddleware
+from backend.middleware.profiling import ProfilingMiddleware
+from backend.migrations import upgrade_database
+from backend.routers import authentication, metrics, recurring_task, task, task_transfer, user
 
+logger = logging.getLogger(__name__)
 
-# 应用生命周期钩子：启动时创建表，关闭时无操作
+
+# 应用生命周期钩子：启动时创建/升级表并启动后台任务（审计字段批量写入、旧任务归档），关闭时写入剩余记录并释放连接池
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await create_tables()  # 启动时创建所有表，无需手动执行 SQL
+    await upgrade_database()  # 启动时创建缺少的表并为已有的表补齐新增的列和索引，无需手动执行 SQL
+    background_tasks = [asyncio.create_task(audit_buffer.run(settings.AUDIT_FLUSH_INTERVAL_SECONDS))]
+    if settings.ARCHIVE_AFTER_DAYS > 0:
+        background_tasks.append(asyncio.create_task(archiver.run(settings.ARCHIVE_INTERVAL_SECONDS)))
     yield  # 应用运行中
-    # 关闭时可添加清理逻辑（如关闭数据库连接）
+    for background_task in background_tasks:
+        background_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await background_task
+    try:
+        await audit_buffer.flush()  # 关闭前写入缓冲区中剩余的记录
+    except Exception:
+        # 关闭时数据库不可用：记录日志后继续释放连接池，不让关闭流程失败
+        logger.exception("Failed to flush %d audit record(s) on shutdown", len(audit_buffer))
+    await shard_router.dispose()  # 关闭所有分片（含主库）读引擎连接池中的连接
 
 
 # 创建FastAPI实例，绑定生命周期钩子
@@ -27,7 +49,13 @@ app = FastAPI(lifespan=lifespan)
 # 注册路由：用户、任务、认证
 app.include_router(user.router)
 app.include_router(task.router)
+app.include_router(task_transfer.router)
+app.include_router(recurring_task.router)
 app.include_router(authentication.router)
+app.include_router(metrics.router)
+
+# 准入控制中间件：按路由类别限制并发，过载时返回503（放在跨域中间件内层，503 响应同样带跨域头）
+app.add_middleware(AdmissionControlMiddleware)
 
 # 配置跨域中间件（允许前端访问）
 app.add_middleware(
@@ -38,8 +66,9 @@ app.add_middleware(
     allow_headers=["*"],    # 允许所有请求头
 )
 
-# 创建数据库表（基于models.py的metadata）
-async def create_tables() -> None:
-    metadata.bind = engine
-    async with engine.begin() as conn:
-        await conn.run_sync(metadata.create_all)
+# 响应压缩中间件（按 Accept-Encoding 选择 zstd / br / gzip，小响应不压缩）
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+
+# 按需性能分析中间件（最外层，覆盖其他中间件的耗时）：仅在配置开启时注册
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
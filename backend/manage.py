@@ -0,0 +1,162 @@
+#后端运维命令入口：python -m backend.manage <command>
+#rebuild-stats：从 task 表全量重算每日统计（task_daily_stat），并输出与现有计数不一致的条目，用于校验增量维护是否正确
+#move-user：把一个用户的任务数据迁移到另一个分片（锁定写入 → 分批复制 → 切换目录 → 清理源分片）
+#archive-tasks：立即把早于归档期限（或 --before 指定日期，不能晚于今天）的任务移入归档表，并相应提高各分片的归档水位
+#upgrade-schema：创建缺少的表，并为旧版本创建的数据库补齐新增的列和索引（应用启动时也会自动执行）
+
+import argparse
+import asyncio
+from collections import Counter
+from datetime import date
+
+from sqlalchemy import delete, insert, select, update
+
+from backend.archiver import archive_old_tasks
+from backend.database import async_session_maker, shard_router
+from backend.migrations import upgrade_database
+from backend.models import SHARD_TABLES, User
+from backend.repositories.archive_repo import ArchiveRepository
+from backend.repositories.stats_repo import StatsRepository
+
+
+# 重建每日统计（逐个分片执行）；--dry-run 时只校验不写入
+async def rebuild_stats(user_id: int | None, dry_run: bool) -> int:
+    mismatches = []
+    for shard_id in range(shard_router.shard_count):
+        async with shard_router.session_maker(shard_id)() as session:
+            mismatches += await StatsRepository(session).rebuild_daily_stats(user_id=user_id, dry_run=dry_run)
+
+    for mismatch_user_id, day, current, expected in mismatches:
+        print(f"user={mismatch_user_id} day={day} stored(total, completed)={current} expected={expected}")
+    print(f"{len(mismatches)} mismatching day(s){' (dry run, nothing written)' if dry_run else ', stats rebuilt'}")
+    return 1 if dry_run and mismatches else 0
+
+
+# 设置用户的分片锁：锁定期间该用户的任务写接口返回503，读接口不受影响
+async def _set_shard_lock(user_id: int, locked: bool, shard_id: int | None = None) -> None:
+    values = {"shard_locked": locked}
+    if shard_id is not None:
+        values["shard_id"] = shard_id
+    async with async_session_maker() as directory:
+        await directory.execute(update(User).where(User.id == user_id).values(**values))
+        await directory.commit()
+
+
+# 迁移用户到目标分片：按 SHARD_TABLES 顺序分批复制（保留原 id），目标分片一次提交后再切换目录；
+#目标分片的归档水位提高到不低于源分片，迁入的归档任务才能被读到
+async def move_user(user_id: int, to_shard: int, batch_size: int, grace_seconds: float) -> int:
+    shard_router.session_maker(to_shard)  # 校验目标分片编号
+    async with async_session_maker() as directory:
+        user = await directory.get(User, user_id)
+    if not user:
+        print(f"user {user_id} not found")
+        return 1
+    from_shard = user.shard_id
+    if from_shard == to_shard:
+        print(f"user {user_id} already on shard {to_shard}")
+        return 0
+
+    await _set_shard_lock(user_id, True)
+    # 等待锁定前已开始的写请求结束
+    await asyncio.sleep(grace_seconds)
+
+    copied: Counter[str] = Counter()
+    try:
+        async with (
+            shard_router.session_maker(from_shard)() as source,
+            shard_router.session_maker(to_shard)() as target,
+        ):
+            for table in SHARD_TABLES:
+                # 清理之前失败的迁移在目标分片留下的数据
+                await target.execute(delete(table).where(table.c.user_id == user_id))
+                result = await source.stream(
+                    select(table).where(table.c.user_id == user_id).execution_options(yield_per=batch_size),
+                )
+                async for rows in result.partitions(batch_size):
+                    await target.execute(insert(table), [dict(row._mapping) for row in rows])
+                    copied[table.name] += len(rows)
+            watermark = await ArchiveRepository(source).get_watermark()
+            if watermark is not None:
+                await ArchiveRepository(target).raise_watermark(watermark)
+            await target.commit()
+    except BaseException:
+        await _set_shard_lock(user_id, False)
+        raise
+
+    # 切换目录并解锁，之后的请求都路由到目标分片
+    await _set_shard_lock(user_id, False, shard_id=to_shard)
+
+    async with shard_router.session_maker(from_shard)() as source:
+        for table in reversed(SHARD_TABLES):
+            await source.execute(delete(table).where(table.c.user_id == user_id))
+        await source.commit()
+
+    print(f"user {user_id} moved from shard {from_shard} to shard {to_shard}: {dict(copied)}")
+    return 0
+
+
+# 立即归档：before 为空时使用配置的归档期限；归档任务只读，不接受晚于今天的日期
+async def archive_tasks(before: date | None, batch_size: int) -> int:
+    if before is not None and before > date.today():
+        print(f"--before {before} is in the future, refusing to archive tasks that have not been posted yet")
+        return 1
+    archived = await archive_old_tasks(cutoff=before, batch_size=batch_size)
+    print(f"{archived} task(s) archived")
+    return 0
+
+
+# 升级数据库结构，输出执行的 DDL
+async def upgrade_schema() -> int:
+    statements = await upgrade_database()
+    for statement in statements:
+        print(statement)
+    print(f"{len(statements)} schema change(s) applied")
+    return 0
+
+
+async def _run(coroutine) -> int:
+    try:
+        return await coroutine
+    finally:
+        await shard_router.dispose()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.manage")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rebuild_parser = subparsers.add_parser("rebuild-stats", help="recompute task_daily_stat from the task table")
+    rebuild_parser.add_argument("--user-id", type=int, default=None, help="only rebuild stats of this user")
+    rebuild_parser.add_argument("--dry-run", action="store_true", help="only report mismatches, do not write")
+
+    move_parser = subparsers.add_parser("move-user", help="move a user's task data to another shard")
+    move_parser.add_argument("--user-id", type=int, required=True)
+    move_parser.add_argument("--to-shard", type=int, required=True)
+    move_parser.add_argument("--batch-size", type=int, default=500, help="rows copied per INSERT")
+    move_parser.add_argument("--grace-seconds", type=float, default=2.0, help="wait for in-flight writes after locking")
+
+    archive_parser = subparsers.add_parser("archive-tasks", help="move old tasks into the archive table")
+    archive_parser.add_argument(
+        "--before",
+        type=date.fromisoformat,
+        default=None,
+        help="archive tasks posted before this date, at most today (default: ARCHIVE_AFTER_DAYS ago)",
+    )
+    archive_parser.add_argument("--batch-size", type=int, default=500, help="rows moved per transaction")
+
+    subparsers.add_parser("upgrade-schema", help="create missing tables and add new columns/indexes to existing ones")
+
+    args = parser.parse_args()
+    if args.command == "rebuild-stats":
+        return asyncio.run(_run(rebuild_stats(args.user_id, args.dry_run)))
+    if args.command == "move-user":
+        return asyncio.run(_run(move_user(args.user_id, args.to_shard, args.batch_size, args.grace_seconds)))
+    if args.command == "archive-tasks":
+        return asyncio.run(_run(archive_tasks(args.before, args.batch_size)))
+    if args.command == "upgrade-schema":
+        return asyncio.run(_run(upgrade_schema()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,164 @@
+#准入控制中间件：按路由类别限制并发数，超出时在有界队列中等待，队列已满或等待超时立即返回503（带 Retry-After）
+#路由类别：auth（登录/注册，bcrypt 哈希耗 CPU）、task_read（任务读接口）、task_write（任务写接口），其余路由不受限；
+#目的：登录风暴时 auth 请求只占用有限的并发，排不上队的尽快拒绝，任务接口的延迟保持稳定；
+#指标：各类别的当前并发、排队数、放行/拒绝计数和排队耗时，通过 GET /metrics/admission/ 查看（需携带 X-Metrics-Token）
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from backend.config import settings
+
+# 认证类接口（CPU 密集）：精确匹配的 (方法, 路径)
+AUTH_ROUTES = {
+    ("POST", "/user/jwt/create/"),
+    ("POST", "/user/google-login/"),
+    ("POST", "/users/register/"),
+}
+READ_METHODS = {"GET", "HEAD"}
+
+
+@dataclass
+class AdmissionStats:
+    admitted: int = 0
+    queued: int = 0  # 曾进入队列等待的请求数
+    shed_queue_full: int = 0
+    shed_timeout: int = 0
+    queue_wait_seconds: float = 0.0  # 排队等待的累计耗时
+
+
+# 单个路由类别的限流器：并发上限 + 有界 FIFO 队列 + 排队超时
+class RouteClassLimiter:
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self.stats = AdmissionStats()
+
+    # 申请一个并发名额；返回 False 表示应拒绝该请求
+    async def acquire(self) -> bool:
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            self.stats.admitted += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.stats.shed_queue_full += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats.queued += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except TimeoutError:
+            self.stats.shed_timeout += 1
+            return False
+        except asyncio.CancelledError:
+            # 名额已转交给本请求但请求被取消（客户端断开），把名额交还
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            self.stats.queue_wait_seconds += time.monotonic() - started
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+        self.stats.admitted += 1
+        return True
+
+    # 释放名额：直接转交给队首仍在等待的请求，否则并发数减一
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def snapshot(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "admitted": self.stats.admitted,
+            "queued": self.stats.queued,
+            "shed_queue_full": self.stats.shed_queue_full,
+            "shed_timeout": self.stats.shed_timeout,
+            "queue_wait_seconds": round(self.stats.queue_wait_seconds, 6),
+        }
+
+
+class AdmissionController:
+    def __init__(self, limiters: list[RouteClassLimiter]):
+        self.limiters = {limiter.name: limiter for limiter in limiters}
+
+    # 根据方法和路径确定路由类别，不受限的路由返回 None
+    def classify(self, method: str, path: str) -> RouteClassLimiter | None:
+        if (method, path) in AUTH_ROUTES:
+            return self.limiters.get("auth")
+        if path.startswith("/task/") or path == "/task":
+            return self.limiters.get("task_read" if method in READ_METHODS else "task_write")
+        return None
+
+    def snapshot(self) -> dict[str, dict]:
+        return {name: limiter.snapshot() for name, limiter in self.limiters.items()}
+
+
+admission_controller = AdmissionController(
+    [
+        RouteClassLimiter(
+            "auth",
+            settings.AUTH_MAX_CONCURRENCY,
+            settings.AUTH_MAX_QUEUE,
+            settings.AUTH_QUEUE_TIMEOUT_SECONDS,
+        ),
+        RouteClassLimiter(
+            "task_read",
+            settings.TASK_READ_MAX_CONCURRENCY,
+            settings.TASK_READ_MAX_QUEUE,
+            settings.TASK_READ_QUEUE_TIMEOUT_SECONDS,
+        ),
+        RouteClassLimiter(
+            "task_write",
+            settings.TASK_WRITE_MAX_CONCURRENCY,
+            settings.TASK_WRITE_MAX_QUEUE,
+            settings.TASK_WRITE_QUEUE_TIMEOUT_SECONDS,
+        ),
+    ],
+)
+
+
+class AdmissionControlMiddleware:
+    def __init__(self, app: ASGIApp, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limiter = self.controller.classify(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await limiter.acquire():
+            response = JSONResponse(
+                {"detail": "Server is busy, please retry shortly"},
+                status_code=503,
+                headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER_SECONDS)},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -0,0 +1,199 @@
+#响应压缩中间件（纯 ASGI 实现）：根据请求头 Accept-Encoding 选择 zstd / br / gzip 压缩响应体
+#可选依赖：安装 compression 扩展（poetry install -E compression，即 zstandard、brotli）后自动启用对应算法，
+#未安装时只使用标准库 gzip；
+#阈值：小于 minimum_size 的完整响应不压缩（压缩收益抵不过 CPU 开销，阈值来源见 backend/benchmarks/compression.py）；
+#流式响应（如 /task/export/）逐块压缩并在每块后 flush，客户端可以边下载边解析，不会等整个响应缓冲完
+
+import zlib
+from collections.abc import Callable
+from typing import Protocol
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - 可选依赖
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 可选依赖
+    zstandard = None
+
+# 值得压缩的内容类型（图片、压缩包等已压缩的内容再压缩只会浪费 CPU）
+COMPRESSIBLE_CONTENT_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/msgpack",
+    "application/javascript",
+)
+
+
+class Encoder(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    # 输出目前为止的全部压缩数据（流式响应每块之后调用）
+    def flush(self) -> bytes: ...
+
+    # 结束压缩流
+    def finish(self) -> bytes: ...
+
+
+class GzipEncoder:
+    def __init__(self, level: int = 6):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder:
+    def __init__(self, quality: int = 4):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    def __init__(self, level: int = 3):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+# 可用的编码（按服务端偏好排序：客户端 q 值相同时优先选靠前的）
+ENCODERS: dict[str, Callable[[], Encoder]] = {}
+if zstandard is not None:
+    ENCODERS["zstd"] = ZstdEncoder
+if brotli is not None:
+    ENCODERS["br"] = BrotliEncoder
+ENCODERS["gzip"] = GzipEncoder
+
+
+# 解析 Accept-Encoding，返回客户端可接受且服务端支持的最佳编码；都不可用时返回 None
+def choose_encoding(accept_encoding: str, encoders: dict[str, Callable[[], Encoder]] = ENCODERS) -> str | None:
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for name in encoders:
+        quality = weights.get(name, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def is_compressible(content_type: str | None) -> bool:
+    return bool(content_type) and content_type.startswith(COMPRESSIBLE_CONTENT_TYPES)
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        encoders: dict[str, Callable[[], Encoder]] = ENCODERS,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encoders = encoders
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encoders)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(send, encoding, self.encoders[encoding], self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+# 单个请求的压缩状态：先暂存响应头，看到第一块响应体后再决定是否压缩
+class _CompressionResponder:
+    def __init__(self, send: Send, encoding: str, encoder_factory: Callable[[], Encoder], minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.encoder_factory = encoder_factory
+        self.minimum_size = minimum_size
+        self.start_message: Message | None = None
+        self.encoder: Encoder | None = None
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.encoder is None:
+            await self._start(body, more_body)
+            return
+
+        compressed = self.encoder.compress(body) + (self.encoder.flush() if more_body else self.encoder.finish())
+        await self._send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+    # 处理第一块响应体：决定压缩与否并发送响应头
+    async def _start(self, body: bytes, more_body: bool) -> None:
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        if (
+            "content-encoding" in headers
+            or not is_compressible(headers.get("content-type"))
+            or (not more_body and len(body) < self.minimum_size)
+        ):
+            self.passthrough = True
+            await self._send(self.start_message)
+            await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        self.encoder = self.encoder_factory()
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if more_body:
+            # 流式响应：长度未知，改用分块传输
+            del headers["Content-Length"]
+            compressed = self.encoder.compress(body) + self.encoder.flush()
+        else:
+            compressed = self.encoder.compress(body) + self.encoder.finish()
+            headers["Content-Length"] = str(len(compressed))
+
+        await self._send(self.start_message)
+        await self._send({"type": "http.response.body", "body": compressed, "more_body": more_body})
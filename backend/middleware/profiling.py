@@ -0,0 +1,72 @@
+#按需请求性能分析中间件：对单个请求完整地跑 cProfile（依赖解析、get_current_user、SQLAlchemy、序列化），
+#结果保存为 .prof 文件
+#开启：配置 PROFILING_ENABLED=True 才会注册该中间件，关闭时没有任何额外开销；
+#触发：请求头 X-Profile 等于 PROFILING_TOKEN（未配置令牌时不能通过请求头触发），或按 PROFILING_SAMPLE_RATE 随机采样；
+#输出：PROFILING_DIR 目录下 <时间>_<方法>_<路由>_<耗时ms>.prof，可用 python -m pstats 或 snakeviz 查看；
+#cProfile 按线程统计，分析期间同一事件循环上其他请求的协程也会计入，同一时刻只分析一个请求
+
+import cProfile
+import random
+import re
+import secrets
+import time
+from datetime import datetime
+from pathlib import Path
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from backend.config import settings
+from backend.database import BACKEND_DIR
+
+PROFILE_HEADER = "x-profile"
+
+
+class ProfilingMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        output_dir: str | Path | None = settings.PROFILING_DIR,
+        token: str | None = settings.PROFILING_TOKEN,
+        sample_rate: float = settings.PROFILING_SAMPLE_RATE,
+    ):
+        self.app = app
+        self.output_dir = Path(output_dir) if output_dir else BACKEND_DIR / "profiles"
+        self.token = token
+        self.sample_rate = sample_rate
+        self._profiling = False  # 是否已有请求正在分析
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self._profiling or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        self._profiling = True
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.disable()
+            self._profiling = False
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            await run_in_threadpool(self._save, profiler, scope, elapsed_ms)
+
+    # 请求头携带正确的令牌，或命中随机采样
+    def _should_profile(self, scope: Scope) -> bool:
+        if self.token:
+            header = Headers(scope=scope).get(PROFILE_HEADER)
+            if header and secrets.compare_digest(header, self.token):
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate  # noqa: S311
+
+    def _save(self, profiler: cProfile.Profile, scope: Scope, elapsed_ms: float) -> None:
+        # 路由模板（如 /task/{task_id}/）在路由匹配后才写入 scope，未匹配时使用原始路径
+        route = scope.get("route")
+        path = getattr(route, "path", scope["path"])
+        route_name = re.sub(r"[^A-Za-z0-9_-]+", "_", path).strip("_") or "root"
+        filename = f"{datetime.now():%Y%m%dT%H%M%S%f}_{scope['method']}_{route_name}_{elapsed_ms:.0f}ms.prof"
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(self.output_dir / filename)
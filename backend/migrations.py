@@ -0,0 +1,95 @@
+#数据库结构升级：create_all 只创建不存在的表，不会修改已有的表，旧版本创建的数据库缺少后来新增的列和索引
+#升级方式：启动时（main.lifespan）或手动执行 python -m backend.manage upgrade-schema，
+#比较模型与数据库中的实际结构，为已有的表补齐新增的列（ALTER TABLE ... ADD COLUMN）、索引和唯一约束，已有数据不受影响；
+#PostgreSQL 中按分片区间分配的 id 列由 INTEGER 扩展为 BIGINT（ALTER COLUMN ... TYPE BIGINT）；
+#新增列必须可为空或带常量 server_default（如 change_seq 的 '0'），已有行按默认值填充；
+#唯一约束（如 uq_task_recurrence_id_posted_at）在已有表上以同名唯一索引补齐（SQLite 不支持 ALTER TABLE 添加约束）；
+#派生数据：新建的每日统计表（task_daily_stat）在同一事务中按已有任务全量计算，增量维护从正确的初值开始
+
+from sqlalchemy import BigInteger, Connection, Integer, MetaData, UniqueConstraint, inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.database import shard_router
+from backend.models import TaskDailyStat, metadata, shard_metadata
+from backend.repositories.stats_repo import StatsRepository
+
+
+# 补齐已有表中缺少的列、索引和唯一约束，返回执行的 DDL 语句（不存在的表由 create_all 创建，这里跳过）
+def upgrade_schema(connection: Connection, target_metadata: MetaData) -> list[str]:
+    inspector = inspect(connection)
+    preparer = connection.dialect.identifier_preparer
+    statements = []
+    for table in target_metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        table_name = preparer.format_table(table)
+
+        existing_columns = {column["name"]: column for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            existing = existing_columns.get(column.name)
+            if existing is None:
+                statements.append(f"ALTER TABLE {table_name} ADD COLUMN {_column_definition(column, connection)}")
+            elif _needs_bigint(existing["type"], column, connection):
+                statements.append(f"ALTER TABLE {table_name} ALTER COLUMN {preparer.format_column(column)} TYPE BIGINT")
+
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        existing_indexes |= {constraint["name"] for constraint in inspector.get_unique_constraints(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                columns = ", ".join(preparer.format_column(column) for column in index.columns)
+                unique = "UNIQUE " if index.unique else ""
+                statements.append(f"CREATE {unique}INDEX {preparer.quote(index.name)} ON {table_name} ({columns})")
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and constraint.name and constraint.name not in existing_indexes:
+                columns = ", ".join(preparer.format_column(column) for column in constraint.columns)
+                statements.append(f"CREATE UNIQUE INDEX {preparer.quote(constraint.name)} ON {table_name} ({columns})")
+
+    for statement in statements:
+        connection.execute(text(statement))
+    return statements
+
+
+# 已有的 32 位整数列是否需要扩展为 BIGINT（分片 id 列，见 models.SHARD_ID_TYPE）；SQLite 的整数本身是 64 位，无需修改
+def _needs_bigint(existing_type, column, connection: Connection) -> bool:
+    return (
+        connection.dialect.name == "postgresql"
+        and isinstance(existing_type, Integer)
+        and not isinstance(existing_type, BigInteger)
+        and column.type.compile(dialect=connection.dialect) == "BIGINT"
+    )
+
+
+# 新增列的定义：类型、常量默认值、NOT NULL 与外键引用
+def _column_definition(column, connection: Connection) -> str:
+    preparer = connection.dialect.identifier_preparer
+    definition = f"{preparer.format_column(column)} {column.type.compile(dialect=connection.dialect)}"
+    server_default = column.server_default
+    if server_default is not None and isinstance(server_default.arg, str):
+        definition += " DEFAULT '{}'".format(server_default.arg.replace("'", "''"))
+    elif not column.nullable:
+        raise RuntimeError(
+            f"Cannot add NOT NULL column {column.table.name}.{column.name} without a constant server_default",
+        )
+    if not column.nullable:
+        definition += " NOT NULL"
+    for foreign_key in column.foreign_keys:
+        referred = foreign_key.column
+        definition += f" REFERENCES {preparer.format_table(referred.table)} ({preparer.format_column(referred)})"
+    return definition
+
+
+# 创建缺少的表并升级已有的表：主库使用完整的 metadata，其余分片只包含按用户分片的表（不含指向 user 表的外键）；
+#新建统计表时同时填充统计
+async def upgrade_database() -> list[str]:
+    statements = []
+    for shard_id, shard_engine in enumerate(shard_router.write_engines):
+        target_metadata = metadata if shard_id == 0 else shard_metadata
+        async with shard_engine.begin() as conn:
+            has_stats = await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table(TaskDailyStat.__tablename__))
+            await conn.run_sync(target_metadata.create_all)
+            statements += await conn.run_sync(upgrade_schema, target_metadata)
+            if not has_stats:
+                # 统计表刚创建：按已有任务填充（会话加入外层事务，与建表一起提交）
+                async with AsyncSession(bind=conn, info={"shard_id": shard_id}) as db_session:
+                    await StatsRepository(db_session).rebuild_daily_stats()
+    return statements
@@ -16,19 +16,26 @@ from datetime import date, datetime
 #uuid根据当前电脑的各种状态生成不同的字符串来保证唯一性
 from sqlalchemy import (
     UUID,
+    BigInteger,
     Boolean,
     Date,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     MetaData,
     String,
+    UniqueConstraint,
     func,
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 metadata = MetaData()  # 元数据：管理所有表结构，用于创建表
 
+# 按分片区间分配的主键及引用它的列（见 database.SHARD_ID_SPAN）：1 号及之后分片的 id 超出 32 位整数，
+#PostgreSQL 中为 BIGINT；SQLite 的 INTEGER 本身就是 64 位，保留 INTEGER PRIMARY KEY（rowid 别名）
+SHARD_ID_TYPE = BigInteger().with_variant(Integer, "sqlite")
+
 # 抽象基类：封装通用字段，所有表继承
 class BaseModel(DeclarativeBase):
     __abstract__ = True # 标记为抽象类，不生成实际表
@@ -63,6 +70,10 @@ class User(BaseModel):
     name: Mapped[str] = mapped_column(String(150), default="")   # 真实姓名
     email: Mapped[str] = mapped_column(String(254), unique=True)   # 邮箱（唯一）
     last_login: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)  # 最后登录时间
+    last_token_refresh: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)  # 最后刷新令牌时间
+    # 分片目录：用户任务数据所在的分片编号（0 为主库），迁移期间 shard_locked 为真，暂停该用户的任务写入
+    shard_id: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    shard_locked: Mapped[bool] = mapped_column(Boolean, default=False, server_default="0")
     # 一对多关联：一个用户对应多个任务
     #作用（ORM 层面）
     #这是ORM 级别的正向访问方式，让 User 实例可以直接通过 user.tasks 获取该用户关联的所有 Task 实例，无需手动编写 JOIN 查询
@@ -74,7 +85,7 @@ class User(BaseModel):
 class Task(BaseModel):
     __tablename__ = "task"
 
-    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    id: Mapped[int] = mapped_column(SHARD_ID_TYPE, primary_key=True, autoincrement=True)
     guid: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), unique=True, default=uuid.uuid4)
     priority: Mapped[int] = mapped_column(Integer)  # 任务优先级（数字越小优先级越高）
     text: Mapped[str] = mapped_column(String)
@@ -90,7 +101,138 @@ class Task(BaseModel):
     #这是ORM 级别的反向访问方式，让 Task 实例可以直接通过 task.user 获取该任务所属的 User 实例，同样无需手动查询
     #没有反向关联的后果要获取任务所属的用户，必须手动写 WHERE 查询：
     user: Mapped["User"] = relationship(back_populates="tasks")
+    # 重复任务的某次发生被编辑/完成/删除时才会落地为一行，recurrence_id 指向所属规则
+    #(recurrence_id, posted_at) 唯一：同一规则同一天最多落地一行；删除该次发生时以软删除行记录，用于屏蔽展开
+    recurrence_id: Mapped[int | None] = mapped_column(SHARD_ID_TYPE, ForeignKey("recurring_task.id"), nullable=True)
+    # 增量同步：每次创建/更新/删除（软删除即墓碑）都从 task_sync_state 取该用户的下一个序号
+    change_seq: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+
+    __table_args__ = (
+        UniqueConstraint("recurrence_id", "posted_at", name="uq_task_recurrence_id_posted_at"),
+        Index("ix_task_user_id_posted_at", "user_id", "posted_at"),  # 按日期/日期区间查询任务
+        Index("ix_task_user_id_change_seq_id", "user_id", "change_seq", "id"),  # 增量同步按 (序号, id) 游标翻页
+        Index("ix_task_posted_at", "posted_at"),  # 归档任务按日期查找过期的任务
+    )
+
+
+# 重复任务规则表：规则只存一行，查询时按请求的日期窗口惰性展开（见 backend/recurrence.py）
+class RecurringTask(BaseModel):
+    __tablename__ = "recurring_task"
+
+    id: Mapped[int] = mapped_column(SHARD_ID_TYPE, primary_key=True, autoincrement=True)
+    guid: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), unique=True, default=uuid.uuid4)
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), index=True)
+    priority: Mapped[int] = mapped_column(Integer)
+    text: Mapped[str] = mapped_column(String)
+    frequency: Mapped[str] = mapped_column(String(10))  # daily / weekly / monthly
+    interval: Mapped[int] = mapped_column(Integer, default=1)  # 每隔几天/周/月
+    start_date: Mapped[date] = mapped_column(Date)  # 第一次发生的日期
+    end_date: Mapped[date | None] = mapped_column(Date, nullable=True)  # 结束条件：截止日期（含）
+    occurrence_count: Mapped[int | None] = mapped_column(Integer, nullable=True)  # 结束条件：总次数
+    # 增量同步：创建/删除规则时与任务共用该用户的变更序号（见 task_sync_state）
+    change_seq: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+
+    __table_args__ = (
+        Index("ix_recurring_task_user_id_change_seq_id", "user_id", "change_seq", "id"),  # 增量同步按游标翻页
+    )
+
+
+# 每日任务统计表：按 (user_id, day) 增量维护任务总数/完成数
+#与任务写入在同一事务中更新，统计接口直接读取该表，无需扫描整个 task 表；
+#如怀疑计数漂移，可通过 `python -m backend.manage rebuild-stats` 从 task 表全量重算校验
+class TaskDailyStat(BaseModel):
+    __tablename__ = "task_daily_stat"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)  # 对应任务的 posted_at
+    total: Mapped[int] = mapped_column(Integer, default=0)  # 当天任务总数
+    completed: Mapped[int] = mapped_column(Integer, default=0)  # 当天已完成任务数
+
+
+# 增量同步状态表：每个用户一行，last_seq 为该用户任务及重复任务规则变更的单调递增序号（只增不减，归档/迁移都不会回退）
+class TaskSyncState(BaseModel):
+    __tablename__ = "task_sync_state"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), primary_key=True, autoincrement=False)
+    last_seq: Mapped[int] = mapped_column(Integer, default=0)
+
+
+# 分片内主键计数器：每张表一行，记录本分片已分配的最大 id（见 database.reserve_ids）
+#UPSERT ... RETURNING 一条语句完成递增并返回新值，并发写入不会分到相同的 id
+class IdCounter(BaseModel):
+    __tablename__ = "id_counter"
+
+    table_name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    last_id: Mapped[int] = mapped_column(BigInteger)
+
+
+# 分片内归档水位：每张归档表一行，记录本分片实际使用过的最大归档期限（见 ArchiveRepository.raise_watermark）
+#posted_at 早于水位的任务可能已在归档表中，读取按水位决定是否查询归档表，与当前配置的 ARCHIVE_AFTER_DAYS 无关
+class ArchiveWatermark(BaseModel):
+    __tablename__ = "archive_watermark"
+
+    table_name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    cutoff: Mapped[date] = mapped_column(Date)
+
+
+# 任务归档表：posted_at 早于归档期限（ARCHIVE_AFTER_DAYS）的任务由后台任务分批从 task 表移入（见 backend/archiver.py）
+#保留原 id 及全部列（含软删除行，用于屏蔽已删除的重复任务发生），task 表及其索引只保留近期数据；归档任务只读
+class ArchivedTask(BaseModel):
+    __tablename__ = "task_archive"
+
+    id: Mapped[int] = mapped_column(SHARD_ID_TYPE, primary_key=True, autoincrement=False)
+    guid: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), unique=True)
+    priority: Mapped[int] = mapped_column(Integer)
+    text: Mapped[str] = mapped_column(String)
+    completed: Mapped[bool] = mapped_column(Boolean, default=False)
+    posted_at: Mapped[date] = mapped_column(Date)
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
+    recurrence_id: Mapped[int | None] = mapped_column(SHARD_ID_TYPE, nullable=True)
+    change_seq: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    archived_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_task_archive_user_id_posted_at", "user_id", "posted_at"),
+        Index("ix_task_archive_recurrence_id_posted_at", "recurrence_id", "posted_at"),
+        Index("ix_task_archive_user_id_change_seq_id", "user_id", "change_seq", "id"),  # 增量同步同样读取归档表
+    )
+
+
+# task 与 task_archive 共有的列（归档时按这些列复制）
+ARCHIVED_TASK_COLUMNS = [column.name for column in ArchivedTask.__table__.columns if column.name != "archived_at"]
+
+
+# 按用户分片存放的表（每张表都有 user_id 列）：主库之外的分片只创建这些表，迁移工具按此列表搬迁用户数据
+SHARD_TABLES = [
+    RecurringTask.__table__,
+    Task.__table__,
+    TaskDailyStat.__table__,
+    TaskSyncState.__table__,
+    ArchivedTask.__table__,
+]
+
+
+# 每个分片各自维护的表（不属于某个用户，迁移用户时不搬迁）
+SHARD_STATE_TABLES = [IdCounter.__table__, ArchiveWatermark.__table__]
+
+
+# 额外分片的表结构：复制 SHARD_TABLES、SHARD_STATE_TABLES 并去掉指向 user 表的外键
+#用户目录只在主库，其余分片没有 user 表，跨库外键无法建立（PostgreSQL 等强制外键的数据库会建表失败）；
+#主库（0 号分片）仍按 metadata 建表，保留外键约束；分片内部的外键（如 task.recurrence_id）不受影响
+def _build_shard_metadata() -> MetaData:
+    shard_metadata = MetaData()
+    for table in [*SHARD_TABLES, *SHARD_STATE_TABLES]:
+        shard_table = table.to_metadata(shard_metadata)
+        for constraint in list(shard_table.foreign_key_constraints):
+            if constraint.elements[0].target_fullname.startswith(f"{User.__tablename__}."):
+                shard_table.constraints.discard(constraint)
+                shard_table.foreign_keys.difference_update(constraint.elements)
+                for column in constraint.columns:
+                    column.foreign_keys.difference_update(constraint.elements)
+    return shard_metadata
+
 
+shard_metadata = _build_shard_metadata()
 
 
 #back_populates 用来建立双向关联的映射，让 User.tasks 和 Task.user 互相指向对方，确保两边的关联是同步的。
@@ -0,0 +1,67 @@
+#重复任务规则的展开逻辑：根据规则（每天/每周/每月 + 间隔 + 结束条件）计算指定日期窗口内的发生日期
+#惰性展开：直接定位到窗口内的第一个发生序号，只遍历窗口内的日期，耗时与规则已持续多久无关；
+#结束条件：end_date（截止日期，含当天）与 occurrence_count（总次数）可单独或同时使用，先到者生效；
+#按月重复：目标月份没有对应日期时取当月最后一天（如 1月31日 → 2月28/29日）
+
+import calendar
+from collections.abc import Iterator
+from datetime import date, timedelta
+from typing import Protocol
+
+FREQUENCIES = ("daily", "weekly", "monthly")
+
+
+# 展开所需的规则字段（RecurringTask 模型实例即满足该协议）
+class RecurrenceRule(Protocol):
+    frequency: str
+    interval: int
+    start_date: date
+    end_date: date | None
+    occurrence_count: int | None
+
+
+# 按月偏移日期，超出当月天数时取月末
+def add_months(start: date, months: int) -> date:
+    month_index = start.month - 1 + months
+    year, month = start.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(start.day, calendar.monthrange(year, month)[1]))
+
+
+# 第 index 次发生的日期（从 0 开始）
+def occurrence_at(rule: RecurrenceRule, index: int) -> date:
+    if rule.frequency == "monthly":
+        return add_months(rule.start_date, index * rule.interval)
+    step_days = rule.interval * (7 if rule.frequency == "weekly" else 1)
+    return rule.start_date + timedelta(days=index * step_days)
+
+
+# 窗口起点之前的发生次数，即窗口内第一个可能的发生序号
+def _first_index_from(rule: RecurrenceRule, window_start: date) -> int:
+    if window_start <= rule.start_date:
+        return 0
+    if rule.frequency == "monthly":
+        months = (window_start.year - rule.start_date.year) * 12 + window_start.month - rule.start_date.month
+        index = max(months // rule.interval, 0)
+        # 月末截断可能使该次发生仍早于窗口起点，向后推进
+        while occurrence_at(rule, index) < window_start:
+            index += 1
+        return index
+    step_days = rule.interval * (7 if rule.frequency == "weekly" else 1)
+    return -(-(window_start - rule.start_date).days // step_days)  # 向上取整
+
+
+# 计算规则在 [window_start, window_end] 内的所有发生日期
+def expand_occurrences(rule: RecurrenceRule, window_start: date, window_end: date) -> Iterator[date]:
+    last_day = window_end if rule.end_date is None else min(window_end, rule.end_date)
+    index = _first_index_from(rule, window_start)
+    while rule.occurrence_count is None or index < rule.occurrence_count:
+        occurrence = occurrence_at(rule, index)
+        if occurrence > last_day:
+            return
+        yield occurrence
+        index += 1
+
+
+# 判断某天是否为规则的一次发生
+def is_occurrence(rule: RecurrenceRule, day: date) -> bool:
+    return next(expand_occurrences(rule, day, day), None) == day
@@ -0,0 +1,112 @@
+#封装任务归档（task -> task_archive）相关的数据库操作
+#归档期限：posted_at 早于 archive_cutoff()（今天减去 ARCHIVE_AFTER_DAYS 天）的任务会被后台任务移入归档表；
+#分批：每批按 id 取 batch_size 行，INSERT ... SELECT 复制后删除并提交，单个事务持有写锁的时间很短；
+#水位：每个分片记录实际使用过的最大归档期限（archive_watermark），归档时先提高水位并提交，再移动数据；
+#读取：只有查询区间早于本分片水位时才查询归档表，近期日期的查询只访问 task 表；
+#按水位而不是当前配置判断，调大 ARCHIVE_AFTER_DAYS、设为 0 或手动按更晚的日期归档后，已归档的任务仍能读到
+
+from datetime import date, timedelta
+
+from sqlalchemy import and_, case, delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.config import settings
+from backend.database import dialect_insert
+from backend.models import ARCHIVED_TASK_COLUMNS, ArchivedTask, ArchiveWatermark, Task
+
+
+# 归档期限：早于该日期的任务会被归档；ARCHIVE_AFTER_DAYS 为 0 时不归档，返回 None
+def archive_cutoff(today: date | None = None) -> date | None:
+    if settings.ARCHIVE_AFTER_DAYS <= 0:
+        return None
+    return (today or date.today()) - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+
+
+class ArchiveRepository:
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    # 本分片的归档水位：早于该日期的任务可能已归档；从未归档时返回 None
+    async def get_watermark(self) -> date | None:
+        result = await self.db_session.execute(
+            select(ArchiveWatermark.cutoff).where(ArchiveWatermark.table_name == ArchivedTask.__tablename__),
+        )
+        return result.scalar_one_or_none()
+
+    # 把归档水位提高到 cutoff（只升不降）；不提交，由调用方在移动数据前提交
+    async def raise_watermark(self, cutoff: date) -> None:
+        statement = dialect_insert(self.db_session, ArchiveWatermark).values(
+            table_name=ArchivedTask.__tablename__,
+            cutoff=cutoff,
+            is_deleted=False,
+        )
+        new_cutoff = statement.excluded.cutoff
+        statement = statement.on_conflict_do_update(
+            index_elements=[ArchiveWatermark.table_name],
+            set_={
+                "cutoff": case((ArchiveWatermark.cutoff < new_cutoff, new_cutoff), else_=ArchiveWatermark.cutoff),
+                "updated_at": func.now(),
+            },
+        )
+        await self.db_session.execute(statement)
+
+    # 查询区间是否可能包含已归档的任务
+    async def touches_archive(self, start_date: date) -> bool:
+        watermark = await self.get_watermark()
+        return watermark is not None and start_date < watermark
+
+    # 归档一批过期任务，返回本批移动的行数（小于 batch_size 表示已没有待归档的任务）
+    async def archive_batch(self, cutoff: date, batch_size: int) -> int:
+        result = await self.db_session.execute(
+            select(Task.id).where(Task.posted_at < cutoff).order_by(Task.id.asc()).limit(batch_size),
+        )
+        task_ids = result.scalars().all()
+        if not task_ids:
+            return 0
+
+        task_columns = Task.__table__.c
+        await self.db_session.execute(
+            insert(ArchivedTask).from_select(
+                ARCHIVED_TASK_COLUMNS,
+                select(*(task_columns[name] for name in ARCHIVED_TASK_COLUMNS)).where(Task.id.in_(task_ids)),
+            ),
+        )
+        await self.db_session.execute(
+            delete(Task).where(Task.id.in_(task_ids)).execution_options(synchronize_session=False),
+        )
+        await self.db_session.commit()
+        return len(task_ids)
+
+    # 查询用户在区间内的归档任务（含软删除行，由调用方过滤）；columns 为空时返回 ORM 实例
+    async def get_archived_tasks(self, start_date: date, end_date: date, user_id: int, columns=()) -> list:
+        condition = and_(
+            ArchivedTask.user_id == user_id,
+            ArchivedTask.posted_at >= start_date,
+            ArchivedTask.posted_at <= end_date,
+        )
+        if columns:
+            archive_columns = ArchivedTask.__table__.c
+            result = await self.db_session.execute(
+                select(*(archive_columns[column.name] for column in columns)).where(condition),
+            )
+            return result.all()
+        result = await self.db_session.execute(select(ArchivedTask).where(condition))
+        return result.scalars().all()
+
+    # 用户的任务是否已归档（归档任务只读，写接口据此返回 409 而不是 404）
+    async def is_task_archived(self, task_id: int, user_id: int) -> bool:
+        result = await self.db_session.execute(
+            select(ArchivedTask.id).where(
+                and_(ArchivedTask.id == task_id, ArchivedTask.user_id == user_id, ArchivedTask.is_deleted.is_(False)),
+            ),
+        )
+        return result.first() is not None
+
+    # 重复任务某次发生是否已归档
+    async def is_occurrence_archived(self, rule_id: int, occurrence: date) -> bool:
+        result = await self.db_session.execute(
+            select(ArchivedTask.id).where(
+                and_(ArchivedTask.recurrence_id == rule_id, ArchivedTask.posted_at == occurrence),
+            ),
+        )
+        return result.first() is not None
@@ -0,0 +1,111 @@
+#封装重复任务规则（recurring_task）的数据库操作
+#规则只存一行，不随时间增长；具体某天的发生由 TaskRepository 在查询时展开；
+#删除规则为软删除：已落地（编辑/完成过）的任务行保留，规则不再展开新的发生；
+#导入导出：规则连同已删除发生的日期（skipped_dates）一起导出，导入时重建规则及其删除记录；
+#增量同步：创建/删除规则都领取该用户的新变更序号，删除后的规则作为墓碑下发（见 SyncRepository）
+
+import uuid
+from datetime import date
+
+from sqlalchemy import and_, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.database import reserve_ids
+from backend.models import ArchivedTask, RecurringTask, Task, User
+from backend.repositories.sync_repo import SyncRepository
+from backend.schemas import CreateRecurringTaskSchema, ImportRecurringTaskSchema
+
+
+class RecurringTaskRepository:
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+        self.sync_repo = SyncRepository(db_session)
+
+    # 创建规则（关联当前用户）：INSERT ... RETURNING，无需提交后 refresh
+    async def create_rule(self, rule_schema: CreateRecurringTaskSchema, current_user: User) -> RecurringTask:
+        rule = await self._insert_rule(rule_schema, current_user)
+        await self.db_session.commit()
+        return rule
+
+    # 导入规则：只写入规则本身（已删除发生由 TaskRepository.bulk_skip_occurrences 写入）；不提交，由导入接口统一提交
+    async def import_rule(self, rule_schema: ImportRecurringTaskSchema, current_user: User) -> RecurringTask:
+        return await self._insert_rule(rule_schema, current_user)
+
+    async def _insert_rule(self, rule_schema: CreateRecurringTaskSchema, current_user: User) -> RecurringTask:
+        statement = (
+            insert(RecurringTask)
+            .values(
+                **rule_schema.model_dump(include=set(CreateRecurringTaskSchema.model_fields)),
+                id=await reserve_ids(RecurringTask, self.db_session),
+                guid=uuid.uuid4(),
+                user_id=current_user.id,
+                is_deleted=False,
+                change_seq=await self.sync_repo.next_seq(current_user.id),
+            )
+            .returning(RecurringTask)
+        )
+        return (await self.db_session.execute(statement)).scalar_one()
+
+    # 按ID查询当前用户未删除的规则
+    async def get_rule_by_id(self, rule_id: int, current_user: User) -> RecurringTask | None:
+        result = await self.db_session.execute(
+            select(RecurringTask).where(
+                and_(
+                    RecurringTask.id == rule_id,
+                    RecurringTask.user_id == current_user.id,
+                    RecurringTask.is_deleted.is_(False),
+                ),
+            ),
+        )
+        return result.scalar_one_or_none()
+
+    # 查询当前用户的全部规则
+    async def get_rules(self, current_user: User) -> list[RecurringTask]:
+        result = await self.db_session.execute(
+            select(RecurringTask)
+            .where(and_(RecurringTask.user_id == current_user.id, RecurringTask.is_deleted.is_(False)))
+            .order_by(RecurringTask.start_date.asc(), RecurringTask.priority.asc()),
+        )
+        return result.scalars().all()
+
+    # 查询规则已删除的发生日期（导出用）：{规则ID: [日期, ...]}，包含已归档的删除记录
+    async def get_skipped_dates(self, rule_ids: list[int]) -> dict[int, list[date]]:
+        skipped: dict[int, list[date]] = {rule_id: [] for rule_id in rule_ids}
+        if not rule_ids:
+            return skipped
+        for model in (Task, ArchivedTask):
+            result = await self.db_session.execute(
+                select(model.recurrence_id, model.posted_at).where(
+                    and_(model.recurrence_id.in_(rule_ids), model.is_deleted.is_(True)),
+                ),
+            )
+            for rule_id, occurrence in result:
+                skipped[rule_id].append(occurrence)
+        for occurrences in skipped.values():
+            occurrences.sort()
+        return skipped
+
+    # 查询可能在 [start_date, end_date] 内发生的规则（次数类结束条件在展开时判断）
+    async def get_rules_in_range(self, start_date: date, end_date: date, user_id: int) -> list[RecurringTask]:
+        result = await self.db_session.execute(
+            select(RecurringTask).where(
+                and_(
+                    RecurringTask.user_id == user_id,
+                    RecurringTask.is_deleted.is_(False),
+                    RecurringTask.start_date <= end_date,
+                    or_(RecurringTask.end_date.is_(None), RecurringTask.end_date >= start_date),
+                ),
+            ),
+        )
+        return result.scalars().all()
+
+    # 软删除规则（领取新序号，留下墓碑供增量同步下发）
+    async def delete_rule(self, rule_id: int, current_user: User) -> bool:
+        rule = await self.get_rule_by_id(rule_id, current_user)
+        if not rule:
+            return False
+
+        rule.is_deleted = True
+        rule.change_seq = await self.sync_repo.next_seq(current_user.id)
+        await self.db_session.commit()
+        return True
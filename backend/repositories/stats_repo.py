@@ -0,0 +1,192 @@
+#封装每日任务统计（task_daily_stat）的增量维护、查询与全量重建
+#增量维护：任务写入时调用 bump，与任务变更处于同一事务，由调用方统一提交；
+#按周汇总：按天读取后在内存中按 ISO 周（周一为起点）聚合，行数不超过查询区间的天数；
+#重复任务：统计表只记录已落地的任务行，尚未落地的发生在查询时按规则展开后计入总数（未完成）；
+#全量重建：rebuild_daily_stats 从 task 表（含归档表 task_archive）重新计算，返回与现有计数不一致的条目，用于校验
+
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+from sqlalchemy import and_, case, delete, false, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.database import dialect_insert
+from backend.models import ArchivedTask, Task, TaskDailyStat, User
+from backend.recurrence import expand_occurrences
+from backend.repositories.recurring_task_repo import RecurringTaskRepository
+
+
+class StatsRepository:
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    # 增量更新某用户某天的计数（UPSERT，不提交，由调用方所在事务统一提交）
+    async def bump(self, user_id: int, day: date, total: int = 0, completed: int = 0) -> None:
+        if not total and not completed:
+            return
+        statement = dialect_insert(self.db_session, TaskDailyStat).values(
+            user_id=user_id,
+            day=day,
+            total=total,
+            completed=completed,
+            is_deleted=False,
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[TaskDailyStat.user_id, TaskDailyStat.day],
+            set_={
+                "total": TaskDailyStat.total + statement.excluded.total,
+                "completed": TaskDailyStat.completed + statement.excluded.completed,
+                "updated_at": func.now(),
+            },
+        )
+        await self.db_session.execute(statement)
+
+    # 任务完成状态切换时调整完成数：INSERT ... SELECT 只在状态确实变化时产生一行，无需先查询旧状态
+    async def bump_on_completed_toggle(self, task_id: int, user_id: int, completed: bool) -> None:
+        changed_task = select(
+            Task.user_id,
+            Task.posted_at,
+            literal(0),
+            literal(1 if completed else -1),
+            false(),
+        ).where(
+            and_(
+                Task.id == task_id,
+                Task.user_id == user_id,
+                Task.is_deleted.is_(False),
+                Task.completed.is_not(completed),
+            ),
+        )
+        statement = dialect_insert(self.db_session, TaskDailyStat).from_select(
+            ["user_id", "day", "total", "completed", "is_deleted"],
+            changed_task,
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[TaskDailyStat.user_id, TaskDailyStat.day],
+            set_={
+                "completed": TaskDailyStat.completed + statement.excluded.completed,
+                "updated_at": func.now(),
+            },
+        )
+        await self.db_session.execute(statement)
+
+    # 批量增量更新：deltas 为 {day: (total, completed)}，用于批量写入场景
+    async def bump_many(self, user_id: int, deltas: dict[date, tuple[int, int]]) -> None:
+        for day, (total, completed) in deltas.items():
+            await self.bump(user_id, day, total=total, completed=completed)
+
+    # 按天查询统计（闭区间，按日期升序）：返回 [(日期, total, completed), ...]，包含未落地的重复任务发生
+    async def get_daily_stats(
+        self,
+        start_date: date,
+        end_date: date,
+        current_user: User,
+    ) -> list[tuple[date, int, int]]:
+        statement = (
+            select(TaskDailyStat)
+            .where(
+                and_(
+                    TaskDailyStat.user_id == current_user.id,
+                    TaskDailyStat.day >= start_date,
+                    TaskDailyStat.day <= end_date,
+                ),
+            )
+            .order_by(TaskDailyStat.day.asc())
+        )
+        result = await self.db_session.execute(statement)
+        days = {stat.day: (stat.total, stat.completed) for stat in result.scalars()}
+
+        for day, count in (await self._count_pending_occurrences(start_date, end_date, current_user.id)).items():
+            total, completed = days.get(day, (0, 0))
+            days[day] = (total + count, completed)
+        return [(day, total, completed) for day, (total, completed) in sorted(days.items())]
+
+    # 区间内尚未落地的重复任务发生次数 {日期: 次数}；已落地的发生（含已删除、已归档）已计入统计表或不应计入
+    async def _count_pending_occurrences(self, start_date: date, end_date: date, user_id: int) -> Counter[date]:
+        rules = await RecurringTaskRepository(self.db_session).get_rules_in_range(start_date, end_date, user_id)
+        if not rules:
+            return Counter()
+
+        materialized: set[tuple[int, date]] = set()
+        for model in (Task, ArchivedTask):
+            result = await self.db_session.execute(
+                select(model.recurrence_id, model.posted_at).where(
+                    and_(
+                        model.recurrence_id.in_([rule.id for rule in rules]),
+                        model.posted_at >= start_date,
+                        model.posted_at <= end_date,
+                    ),
+                ),
+            )
+            materialized.update(tuple(row) for row in result)
+
+        counts: Counter[date] = Counter()
+        for rule in rules:
+            for occurrence in expand_occurrences(rule, start_date, end_date):
+                if (rule.id, occurrence) not in materialized:
+                    counts[occurrence] += 1
+        return counts
+
+    # 按周查询统计：返回 [(周一日期, total, completed), ...]
+    async def get_weekly_stats(
+        self,
+        start_date: date,
+        end_date: date,
+        current_user: User,
+    ) -> list[tuple[date, int, int]]:
+        weeks: dict[date, list[int]] = defaultdict(lambda: [0, 0])
+        for day, total, completed in await self.get_daily_stats(start_date, end_date, current_user):
+            week_start = day - timedelta(days=day.weekday())
+            weeks[week_start][0] += total
+            weeks[week_start][1] += completed
+        return [(week_start, total, completed) for week_start, (total, completed) in sorted(weeks.items())]
+
+    # 从 task 表全量重算统计（可限定单个用户），返回不一致的条目 [(user_id, day, 旧值, 新值), ...]
+    async def rebuild_daily_stats(self, user_id: int | None = None, dry_run: bool = False) -> list[tuple]:
+        stat_filter = [] if user_id is None else [TaskDailyStat.user_id == user_id]
+
+        # 归档只是移动任务行，统计需要把两张表的任务合并计算
+        expected: dict[tuple[int, date], tuple[int, int]] = {}
+        for model in (Task, ArchivedTask):
+            task_filter = [model.is_deleted.is_(False)] + ([] if user_id is None else [model.user_id == user_id])
+            result = await self.db_session.execute(
+                select(
+                    model.user_id,
+                    model.posted_at,
+                    func.count(model.id),
+                    func.sum(case((model.completed.is_(True), 1), else_=0)),
+                )
+                .where(*task_filter)
+                .group_by(model.user_id, model.posted_at),
+            )
+            for row in result.all():
+                total, completed = expected.get((row[0], row[1]), (0, 0))
+                expected[(row[0], row[1])] = (total + row[2], completed + int(row[3] or 0))
+
+        result = await self.db_session.execute(
+            select(TaskDailyStat.user_id, TaskDailyStat.day, TaskDailyStat.total, TaskDailyStat.completed).where(
+                *stat_filter,
+            ),
+        )
+        current = {(row[0], row[1]): (row[2], row[3]) for row in result.all()}
+
+        mismatches = [
+            (key[0], key[1], current.get(key, (0, 0)), expected.get(key, (0, 0)))
+            for key in sorted(set(expected) | set(current))
+            if current.get(key, (0, 0)) != expected.get(key, (0, 0))
+        ]
+        if dry_run:
+            return mismatches
+
+        # 先清空再整体写入，保证重建后与 task 表完全一致
+        await self.db_session.execute(delete(TaskDailyStat).where(*stat_filter))
+        if expected:
+            await self.db_session.execute(
+                insert(TaskDailyStat),
+                [
+                    {"user_id": key[0], "day": key[1], "total": total, "completed": completed, "is_deleted": False}
+                    for key, (total, completed) in expected.items()
+                ],
+            )
+        await self.db_session.commit()
+        return mismatches
@@ -0,0 +1,82 @@
+#封装移动端增量同步所需的数据库操作
+#变更序号：每个用户一个单调递增计数器（task_sync_state），任务与重复任务规则每次写入都领取新序号并写入 change_seq；
+#墓碑：删除任务/规则为软删除（is_deleted=True）并领取新序号，增量查询时以墓碑形式下发；
+#重复任务：规则本身作为同步实体下发，由客户端按规则展开；已落地的发生是带 recurrence_id 的任务行，
+#已删除的发生是带 recurrence_id 的墓碑（初次同步也会下发，用于屏蔽展开）；
+#归档：task_archive 中的任务（含墓碑）保留原 id 与 change_seq，与 task 表一起按任务类型下发，
+#归档不会让变更从增量中消失；
+#游标：(change_seq, 实体类型, id) 组合，按该顺序翻页，序号相同的历史数据（如升级前的 0）也能稳定分页
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.database import dialect_insert
+from backend.models import ArchivedTask, RecurringTask, Task, TaskSyncState, User
+
+# 同步实体类型（游标的第二部分，序号相同时任务排在规则之前）
+CHANGE_KIND_TASK = 0
+CHANGE_KIND_RECURRING_TASK = 1
+
+
+class SyncRepository:
+    def __init__(self, db_session: AsyncSession):
+        self.db_session = db_session
+
+    # 为用户领取 count 个连续序号，返回最后一个（即 [last - count + 1, last]）；不提交，与任务写入同一事务
+    async def next_seq(self, user_id: int, count: int = 1) -> int:
+        statement = dialect_insert(self.db_session, TaskSyncState).values(
+            user_id=user_id,
+            last_seq=count,
+            is_deleted=False,
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[TaskSyncState.user_id],
+            set_={"last_seq": TaskSyncState.last_seq + statement.excluded.last_seq, "updated_at": func.now()},
+        ).returning(TaskSyncState.last_seq)
+        return (await self.db_session.execute(statement)).scalar_one()
+
+    # 查询游标之后的变更（含墓碑），按 (change_seq, 实体类型, id) 升序，最多 limit 条
+    #返回 [(实体类型, 任务或规则), ...]；初次同步（cursor 为 None）不下发墓碑，
+    #但保留已删除的重复任务发生（客户端展开规则时需要跳过这些日期）
+    async def get_changes(
+        self,
+        current_user: User,
+        cursor: tuple[int, int, int] | None,
+        limit: int,
+    ) -> list[tuple[int, Task | ArchivedTask | RecurringTask]]:
+        changes = []
+        for kind, model, initial_condition in (
+            (CHANGE_KIND_TASK, Task, or_(Task.is_deleted.is_(False), Task.recurrence_id.is_not(None))),
+            (
+                CHANGE_KIND_TASK,
+                ArchivedTask,
+                or_(ArchivedTask.is_deleted.is_(False), ArchivedTask.recurrence_id.is_not(None)),
+            ),
+            (CHANGE_KIND_RECURRING_TASK, RecurringTask, RecurringTask.is_deleted.is_(False)),
+        ):
+            conditions = [model.user_id == current_user.id]
+            if cursor is None:
+                conditions.append(initial_condition)
+            else:
+                conditions.append(self._after_cursor(model, kind, cursor))
+            statement = (
+                select(model)
+                .where(and_(*conditions))
+                .order_by(model.change_seq.asc(), model.id.asc())
+                .limit(limit)
+            )
+            result = await self.db_session.execute(statement)
+            changes += [(kind, entity) for entity in result.scalars()]
+
+        changes.sort(key=lambda change: (change[1].change_seq, change[0], change[1].id))
+        return changes[:limit]
+
+    # 位于游标 (since_seq, since_kind, since_id) 之后的条件
+    @staticmethod
+    def _after_cursor(model, kind: int, cursor: tuple[int, int, int]):
+        since_seq, since_kind, since_id = cursor
+        if kind > since_kind:
+            return model.change_seq >= since_seq
+        if kind < since_kind:
+            return model.change_seq > since_seq
+        return or_(model.change_seq > since_seq, and_(model.change_seq == since_seq, model.id > since_id))
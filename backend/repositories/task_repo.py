@@ -2,78 +2,362 @@
 #权限校验：所有任务操作都关联user_id，确保用户只能操作自己的任务；
 #批量更新：bulk_update_priorities使用 SQLAlchemy 的批量更新，减少数据库交互次数；
 #排序：查询任务时按priority升序，保证优先级高的任务排在前面
+#统计：创建/更新/删除任务时在同一事务内增量维护 task_daily_stat（见 StatsRepository）
+#导入导出：stream_tasks 通过服务端游标分块读取，bulk_create_tasks 以多行 INSERT 分块写入，内存占用与任务总数无关
+#重复任务：查询时按日期窗口展开规则，与已落地的任务行合并；只有编辑/完成/删除某次发生时才落地一行
+#分片：会话绑定到用户所在分片，新任务 id 在分片独占的区间内生成（见 database.reserve_ids）
+#增量同步：每次写入都领取该用户的新变更序号（change_seq）；删除为软删除，保留墓碑供客户端同步
+#归档：早于归档期限的任务位于 task_archive（只读），只有查询区间早于期限时才合并查询归档表
+#精简读取：列表查询 lean=True 时只查询响应需要的列，结果装入轻量的 TaskRow（命名元组），不构造 ORM 实例、不进入身份映射
 
-from datetime import date
+import uuid
+from collections.abc import AsyncIterator, Sequence
+from datetime import date, datetime
+from typing import NamedTuple
 
 from fastapi import HTTPException, status
-from sqlalchemy import and_, select, update
+from sqlalchemy import Row, and_, func, insert, select, union_all, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.models import Task, User
-from backend.schemas import CreateTaskSchema, UpdateTaskSchema
+from backend.database import reserve_ids
+from backend.models import ArchivedTask, RecurringTask, Task, User
+from backend.recurrence import expand_occurrences, is_occurrence
+from backend.repositories.archive_repo import ArchiveRepository
+from backend.repositories.recurring_task_repo import RecurringTaskRepository
+from backend.repositories.stats_repo import StatsRepository
+from backend.repositories.sync_repo import SyncRepository
+from backend.schemas import CreateTaskSchema, ImportTaskSchema, UpdateTaskSchema
+
+# 列表接口响应需要的列（DisplayDatedTaskSchema 的字段）
+LISTING_COLUMNS = (
+    Task.id,
+    Task.priority,
+    Task.text,
+    Task.completed,
+    Task.created_at,
+    Task.recurrence_id,
+    Task.posted_at,
+)
+
+
+# 精简模式的任务行：字段顺序与 LISTING_COLUMNS + is_deleted 一致
+#（命名元组的属性读取比 Row 快，响应序列化按属性校验时开销最小）
+class TaskRow(NamedTuple):
+    id: int | None
+    priority: int
+    text: str
+    completed: bool
+    created_at: datetime
+    recurrence_id: int | None
+    posted_at: date
+    is_deleted: bool = False
 
 
 class TaskRepository:
     def __init__(self, db_session: AsyncSession):
         self.db_session = db_session
+        self.stats_repo = StatsRepository(db_session)  # 共享同一会话，保证统计与任务在同一事务
+        self.recurring_task_repo = RecurringTaskRepository(db_session)
+        self.sync_repo = SyncRepository(db_session)
+        self.archive_repo = ArchiveRepository(db_session)
 
-    # 按ID查询任务
+    # 按ID查询任务（已删除的重复任务发生记录视为不存在）
     async def get_task_by_id(self, task_id: int) -> Task | None:
         task = await self.db_session.get(Task, task_id)
+        if task and task.is_deleted:
+            return None
         return task
 
-     # 按日期+用户ID查询任务（按优先级升序排序）
-    async def get_tasks_by_date(self, selected_date: date, current_user: User) -> list[Task]:
+     # 按日期+用户ID查询任务（按优先级升序排序），包含当天展开的重复任务
+    async def get_tasks_by_date(
+        self,
+        selected_date: date,
+        current_user: User,
+        lean: bool = False,
+    ) -> list[Task] | list[TaskRow]:
+        tasks = await self.get_tasks_by_range(selected_date, selected_date, current_user, lean=lean)
+        return sorted(tasks, key=lambda task: task.priority)
+
+    # 按日期区间查询任务（闭区间，按日期、优先级升序），重复任务在窗口内按需展开
+    #lean=True：只查询 LISTING_COLUMNS，返回只读的 TaskRow，适合直接序列化响应的只读接口
+    async def get_tasks_by_range(
+        self,
+        start_date: date,
+        end_date: date,
+        current_user: User,
+        lean: bool = False,
+    ) -> list[Task] | list[TaskRow]:
+        condition = and_(Task.user_id == current_user.id, Task.posted_at >= start_date, Task.posted_at <= end_date)
+        if lean:
+            result = await self.db_session.execute(select(*LISTING_COLUMNS, Task.is_deleted).where(condition))
+            stored_tasks = [TaskRow._make(row) for row in result]
+            build_occurrence = self._build_occurrence_row
+        else:
+            result = await self.db_session.execute(select(Task).where(condition))
+            stored_tasks = result.scalars().all()
+            build_occurrence = self._build_occurrence
+        # 区间早于归档水位时合并归档表（尚未归档的旧任务仍在 task 表中，两边都要查）；
+        #水位在 task 表之后读取：归档先提交水位再移动数据，已被移走的行一定能通过水位查到
+        if await self.archive_repo.touches_archive(start_date):
+            columns = (*LISTING_COLUMNS, Task.is_deleted) if lean else ()
+            archived = await self.archive_repo.get_archived_tasks(start_date, end_date, current_user.id, columns)
+            if lean:
+                archived = [TaskRow._make(row) for row in archived]
+            stored_tasks = [*stored_tasks, *archived]
+
+        # 已落地（含已删除）的发生不再展开，避免重复显示或“复活”已删除的发生
+        materialized = {(task.recurrence_id, task.posted_at) for task in stored_tasks if task.recurrence_id}
+        tasks = [task for task in stored_tasks if not task.is_deleted]
+
+        for rule in await self.recurring_task_repo.get_rules_in_range(start_date, end_date, current_user.id):
+            for occurrence in expand_occurrences(rule, start_date, end_date):
+                if (rule.id, occurrence) not in materialized:
+                    tasks.append(build_occurrence(rule, occurrence))
+
+        return sorted(tasks, key=lambda task: (task.posted_at, task.priority))
+
+    # 构造未落地的发生（临时对象，不加入会话，id 为 None）
+    @staticmethod
+    def _build_occurrence(rule: RecurringTask, occurrence: date) -> Task:
+        return Task(
+            priority=rule.priority,
+            text=rule.text,
+            completed=False,
+            posted_at=occurrence,
+            user_id=rule.user_id,
+            recurrence_id=rule.id,
+            created_at=rule.created_at,
+        )
+
+    # 精简模式下构造未落地的发生（id 为 None）
+    @staticmethod
+    def _build_occurrence_row(rule: RecurringTask, occurrence: date) -> TaskRow:
+        return TaskRow(
+            id=None,
+            priority=rule.priority,
+            text=rule.text,
+            completed=False,
+            created_at=rule.created_at,
+            recurrence_id=rule.id,
+            posted_at=occurrence,
+        )
+
+    # 落地重复任务的某次发生（编辑/完成/删除时调用），返回落地后的任务行
+    #skip=True 表示删除该次发生：以软删除行记录，不计入统计
+    async def materialize_occurrence(
+        self,
+        rule: RecurringTask,
+        occurrence: date,
+        new_task: UpdateTaskSchema | None = None,
+        skip: bool = False,
+    ) -> Task:
+        if not is_occurrence(rule, occurrence):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Recurring task {rule.id} does not occur on {occurrence}",
+            )
+
+        result = await self.db_session.execute(
+            select(Task).where(and_(Task.recurrence_id == rule.id, Task.posted_at == occurrence)),
+        )
+        task = result.scalar_one_or_none()
+        if task:
+            if task.is_deleted:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Occurrence of recurring task {rule.id} on {occurrence} was deleted",
+                )
+            # 已落地：退化为普通任务的更新/删除
+            if skip:
+                await self.delete_task(task.id, rule.user_id)
+                return task
+            return await self.update_task(task.id, rule.user_id, new_task or UpdateTaskSchema())
+        if await self.archive_repo.touches_archive(occurrence) and await self.archive_repo.is_occurrence_archived(
+            rule.id,
+            occurrence,
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Occurrence of recurring task {rule.id} on {occurrence} is archived and read-only",
+            )
+
+        values = {"priority": rule.priority, "text": rule.text, "completed": False}
+        if new_task:
+            values.update(self._update_values(new_task))
         statement = (
-            select(Task)
-            .where(and_(Task.posted_at == selected_date, Task.user_id == current_user.id))
-            .order_by(Task.priority.asc())
+            insert(Task)
+            .values(
+                **values,
+                id=await reserve_ids(Task, self.db_session, ArchivedTask),
+                guid=uuid.uuid4(),
+                posted_at=occurrence,
+                user_id=rule.user_id,
+                recurrence_id=rule.id,
+                is_deleted=skip,
+                change_seq=await self.sync_repo.next_seq(rule.user_id),
+            )
+            .returning(Task)
         )
-        result = await self.db_session.execute(statement)
-        tasks = result.scalars().all()
-        return tasks
+        task = (await self.db_session.execute(statement)).scalar_one()
+        if not skip:
+            await self.stats_repo.bump(rule.user_id, occurrence, total=1, completed=int(task.completed))
+        await self.db_session.commit()
+        return task
 
-    # 创建任务（关联当前用户）
+    # 创建任务（关联当前用户）：INSERT ... RETURNING 一次拿到数据库生成的字段（id、created_at），无需提交后再 refresh
     async def create_task(self, create_task_schema: CreateTaskSchema, current_user: User) -> Task:
-        task = Task(
-            priority=create_task_schema.priority,
-            text=create_task_schema.text,
-            user_id=current_user.id,   # 绑定当前用户
-            posted_at=create_task_schema.posted_at,
+        statement = (
+            insert(Task)
+            .values(
+                id=await reserve_ids(Task, self.db_session, ArchivedTask),
+                guid=uuid.uuid4(),
+                priority=create_task_schema.priority,
+                text=create_task_schema.text,
+                completed=False,
+                user_id=current_user.id,   # 绑定当前用户
+                posted_at=create_task_schema.posted_at,
+                is_deleted=False,
+                change_seq=await self.sync_repo.next_seq(current_user.id),
+            )
+            .returning(Task)
         )
+        task = (await self.db_session.execute(statement)).scalar_one()
 
-        self.db_session.add(task)
+        await self.stats_repo.bump(current_user.id, task.posted_at, total=1)
         await self.db_session.commit()
-        await self.db_session.refresh(task)
         return task
 
+    # 批量创建任务（导入用）：一条多行 INSERT 写入一批任务，并按天汇总更新统计；不提交，由调用方在全部批次完成后统一提交
+    async def bulk_create_tasks(self, task_schemas: Sequence[ImportTaskSchema], current_user: User) -> int:
+        deltas: dict[date, tuple[int, int]] = {}
+        rows = []
+        for task_schema in task_schemas:
+            rows.append(
+                {
+                    "priority": task_schema.priority,
+                    "text": task_schema.text,
+                    "completed": task_schema.completed,
+                    "posted_at": task_schema.posted_at,
+                    "recurrence_id": task_schema.recurrence_id,
+                    "is_deleted": False,
+                },
+            )
+            total, completed = deltas.get(task_schema.posted_at, (0, 0))
+            deltas[task_schema.posted_at] = (total + 1, completed + int(task_schema.completed))
+
+        await self._bulk_insert(rows, current_user)
+        await self.stats_repo.bump_many(current_user.id, deltas)
+        return len(rows)
+
+    # 批量写入重复任务已删除发生的记录（导入用）：软删除行只用于屏蔽展开，不计入统计；不提交
+    async def bulk_skip_occurrences(self, rule: RecurringTask, occurrences: Sequence[date], current_user: User) -> None:
+        await self._bulk_insert(
+            [
+                {
+                    "priority": rule.priority,
+                    "text": rule.text,
+                    "completed": False,
+                    "posted_at": occurrence,
+                    "recurrence_id": rule.id,
+                    "is_deleted": True,
+                }
+                for occurrence in occurrences
+            ],
+            current_user,
+        )
+
+    # 多行 INSERT：为每行分配分片内连续的 id 与连续的变更序号
+    async def _bulk_insert(self, rows: list[dict], current_user: User) -> None:
+        if not rows:
+            return
+        first_id = await reserve_ids(Task, self.db_session, ArchivedTask, count=len(rows))
+        last_seq = await self.sync_repo.next_seq(current_user.id, count=len(rows))
+        first_seq = last_seq - len(rows) + 1
+        for offset, row in enumerate(rows):
+            row.update(id=first_id + offset, change_seq=first_seq + offset, guid=uuid.uuid4(), user_id=current_user.id)
+        await self.db_session.execute(insert(Task).values(rows))
 
-    # 删除任务（校验任务归属）
+    # 分块流式读取用户全部任务（导出用）：服务端游标每次只取 chunk_size 行，按日期、优先级排序
+    #导出包含归档任务：两张表 UNION ALL 后统一排序；重复任务规则由 RecurringTaskRepository 另行读取
+    async def stream_tasks(self, current_user: User, chunk_size: int) -> AsyncIterator[Sequence[Row]]:
+        statement = (
+            union_all(
+                *(
+                    select(
+                        model.text,
+                        model.priority,
+                        model.completed,
+                        model.posted_at,
+                        model.created_at,
+                        model.recurrence_id,
+                    ).where(and_(model.user_id == current_user.id, model.is_deleted.is_(False)))
+                    for model in (Task, ArchivedTask)
+                ),
+            )
+            .order_by("posted_at", "priority")
+            .execution_options(yield_per=chunk_size)
+        )
+        result = await self.db_session.stream(statement)
+        async for partition in result.partitions(chunk_size):
+            yield partition
+
+    # 删除任务（校验任务归属）：软删除并领取新序号，留下墓碑供增量同步下发
+    #重复任务的发生同样保留软删除行，防止查询时被重新展开
     async def delete_task(self, task_id: int, user_id: int) -> bool:
         # 仅删除当前用户的任务
-        result = await self.db_session.execute(select(Task).where(and_(Task.id == task_id, Task.user_id == user_id)))
-        task = result.scalar_one_or_none()
-        if not task:
+        result = await self.db_session.execute(
+            update(Task)
+            .where(and_(Task.id == task_id, Task.user_id == user_id, Task.is_deleted.is_(False)))
+            .values(is_deleted=True, change_seq=await self.sync_repo.next_seq(user_id), updated_at=func.now())
+            .returning(Task.posted_at, Task.completed)
+            .execution_options(synchronize_session=False),
+        )
+        row = result.one_or_none()
+        if not row:
+            await self.db_session.rollback()
             return False
 
-        await self.db_session.delete(task)
+        await self.stats_repo.bump(user_id, row.posted_at, total=-1, completed=-1 if row.completed else 0)
         await self.db_session.commit()
         return True
 
-    # 更新任务（部分字段更新）
-    async def update_task(self, task: Task, new_task: UpdateTaskSchema) -> Task:
-        if new_task.text:
-            task.text = new_task.text
-        if new_task.priority:
-            task.priority = new_task.priority
+    # 更新任务（部分字段更新）：UPDATE ... RETURNING，归属校验放在 WHERE 中；任务不存在或不属于该用户时返回 None
+    async def update_task(self, task_id: int, user_id: int, new_task: UpdateTaskSchema) -> Task | None:
         if new_task.completed is not None:
-            task.completed = new_task.completed
+            # 完成状态切换时同步调整当天的完成数（必须在 UPDATE 之前执行，以便比较旧状态）
+            await self.stats_repo.bump_on_completed_toggle(task_id, user_id, new_task.completed)
 
-        await self.db_session.commit()
-        await self.db_session.refresh(task)
+        statement = (
+            update(Task)
+            .where(and_(Task.id == task_id, Task.user_id == user_id, Task.is_deleted.is_(False)))
+            .values(
+                **self._update_values(new_task),
+                change_seq=await self.sync_repo.next_seq(user_id),
+                updated_at=func.now(),
+            )
+            .returning(Task)
+            .execution_options(synchronize_session=False)
+        )
+        task = (await self.db_session.execute(statement)).scalar_one_or_none()
+        if task is None:
+            await self.db_session.rollback()
+            return None
 
+        await self.db_session.commit()
         return task
 
+    # 部分更新时需要写入的字段
+    @staticmethod
+    def _update_values(new_task: UpdateTaskSchema) -> dict:
+        values = {}
+        if new_task.text:
+            values["text"] = new_task.text
+        if new_task.priority:
+            values["priority"] = new_task.priority
+        if new_task.completed is not None:
+            values["completed"] = new_task.completed
+        return values
+
     # 批量更新任务优先级（核心逻辑）
     async def bulk_update_priorities(self, priorities: dict[int, int], current_user: User):
         """
@@ -82,7 +366,9 @@ class TaskRepository:
         # 校验所有任务ID是否属于当前用户
         # make sure all tasks (ids) belong to the current user
         result = await self.db_session.execute(
-            select(Task.id).where(and_(Task.user_id == current_user.id, Task.id.in_(priorities))),
+            select(Task.id).where(
+                and_(Task.user_id == current_user.id, Task.id.in_(priorities), Task.is_deleted.is_(False)),
+            ),
         )
         task_ids = result.scalars().all()  # returns list of ids
         # 若传入的ID数与用户的任务ID数不匹配，抛出异常
@@ -94,7 +380,11 @@ class TaskRepository:
             )
 
         # unpack into {id: key, priority:value}   构造更新数据：[{id:1, priority:2}, ...]
-        priorities_to_update = [{"id": task_id, "priority": priority} for task_id, priority in priorities.items()]
-        # 批量更新（高效，一次SQL操作）
+        last_seq = await self.sync_repo.next_seq(current_user.id, count=len(priorities))
+        priorities_to_update = [
+            {"id": task_id, "priority": priority, "change_seq": last_seq - offset}
+            for offset, (task_id, priority) in enumerate(priorities.items())
+        ]
+        # 批量更新（高效，一次SQL操作）；仅修改优先级，不影响每日统计
         await self.db_session.execute(update(Task), priorities_to_update)
         await self.db_session.commit()
@@ -5,13 +5,17 @@
 
 import secrets
 import string
-from datetime import datetime, timezone
+import uuid
+from datetime import datetime
 
-from fastapi import status
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from httpx import AsyncClient, Response
-from sqlalchemy import or_, select
+from sqlalchemy import bindparam, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.database import shard_router
 from backend.models import User
 from backend.schemas import UserCreate
 from backend.utils import get_hashed_password, verify_hashed_password
@@ -29,7 +33,8 @@ class UserRepository:
             return False
         # check if passwords match - use hashed_password to check
          # 验证密码（明文 vs 哈希）
-        if not verify_hashed_password(plain_password=password, hashed_password=user.password):
+        #bcrypt 计算耗 CPU，放到线程池执行，避免阻塞事件循环上的其他请求
+        if not await run_in_threadpool(verify_hashed_password, plain_password=password, hashed_password=user.password):
             return False
         return user
 
@@ -55,21 +60,41 @@ class UserRepository:
         return result.scalar_one_or_none()
 
 
-     # 创建用户（注册核心逻辑）
+     # 创建用户（注册核心逻辑）：一条 INSERT ... RETURNING 完成写入
+    #用户名/邮箱唯一性由数据库唯一约束保证，冲突时映射为409，无需插入前逐个查询
     async def create_user(self, user_schema: UserCreate) -> User:
          # 密码加密
-        hashed_password = get_hashed_password(user_schema.password)
-         # 创建User模型实例
-        user = User(
-            email=user_schema.email,
-            name=user_schema.name,
-            username=user_schema.username,
-            password=hashed_password,
+        hashed_password = await run_in_threadpool(get_hashed_password, user_schema.password)
+        statement = (
+            insert(User)
+            .values(
+                guid=uuid.uuid4(),
+                email=user_schema.email,
+                name=user_schema.name,
+                username=user_schema.username,
+                password=hashed_password,
+                is_deleted=False,
+                shard_id=shard_router.shard_for_new_user(user_schema.username),  # 分配任务数据所在分片
+                shard_locked=False,
+            )
+            .returning(User)
         )
-         # 提交到数据库
-        self.db_session.add(user)
-        await self.db_session.commit()
-        await self.db_session.refresh(user)  # 刷新实例，获取数据库生成的字段（如id）# 刷新实例，获取数据库生成的字段（如id）
+        try:
+            user = (await self.db_session.execute(statement)).scalar_one()
+            await self.db_session.commit()
+        except IntegrityError as e:
+            await self.db_session.rollback()
+            # 根据冲突的约束区分用户名/邮箱，用户名优先（与注册接口原先逐个校验的顺序一致）
+            # SQLite: "UNIQUE constraint failed: user.username"，PostgreSQL: "user_username_key"
+            #数据库只报告其中一个冲突的约束，报告的是邮箱时再确认用户名是否也已存在
+            message = str(e.orig)
+            if "username" in message or (
+                "email" in message and await self.get_user_by_username(user_schema.username)
+            ):
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Username already exists")
+            if "email" in message:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already exists")
+            raise
         return user
 
     # 按ID删除用户（软删除/物理删除？这里是物理删除，可改为软删除）
@@ -88,13 +113,14 @@ class UserRepository:
         # generate random password for google user and hash it
         alphabet = string.ascii_letters + string.digits + string.punctuation
         password = "".join(secrets.choice(alphabet) for _ in range(20))
-        hashed_password = get_hashed_password(password)
+        hashed_password = await run_in_threadpool(get_hashed_password, password)
         # 创建用户（用Google邮箱作为用户名）
         user = User(
             username=kwargs.get("email"),  # Using Google email as username
             email=kwargs.get("email"),
             name=f"{kwargs.get('given_name')} {kwargs.get('family_name')}",
             password=hashed_password,
+            shard_id=shard_router.shard_for_new_user(kwargs.get("email")),
         )
         self.db_session.add(user)
         await self.db_session.commit()
@@ -121,7 +147,13 @@ class UserRepository:
 
         return None
 
-    # 更新用户最后登录时间
-    async def update_user_last_login(self, user: User) -> None:
-        user.last_login = datetime.now(timezone.utc)
-        await self.db_session.commit()
+    # 批量更新审计字段（如 last_login）：按主键的批量 UPDATE，一次执行写入多个用户；不提交，由调用方提交
+    async def bulk_update_audit_field(self, field: str, values: dict[int, datetime]) -> None:
+        if not values:
+            return
+        # Core UPDATE + executemany：已删除的用户只是匹配 0 行（ORM 按主键批量更新会抛 StaleDataError）
+        users = User.__table__
+        await self.db_session.execute(
+            update(users).where(users.c.id == bindparam("b_user_id")).values({field: bindparam("b_at")}),
+            [{"b_user_id": user_id, "b_at": at} for user_id, at in values.items()],
+        )
@@ -0,0 +1,63 @@
+#任务接口的响应内容协商：请求头 Accept 为 application/msgpack（或 x-msgpack / vnd.msgpack）时返回 MessagePack，
+#否则返回 JSON（msgpack 为必需依赖）；
+#用法：路由器设置 route_class=NegotiatedRoute、default_response_class=NegotiatedResponse；
+#NegotiatedRoute 在处理请求前把协商结果放入上下文变量，NegotiatedResponse 渲染时据此选择编码
+#（两种格式都直接由同一份已编码数据生成，无需二次解析 JSON）
+
+from contextvars import ContextVar
+from typing import Any
+
+import msgpack
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+
+_use_msgpack: ContextVar[bool] = ContextVar("use_msgpack", default=False)
+
+
+# 客户端是否偏好 MessagePack：MessagePack 类型的 q 值大于 0 且不低于 application/json
+def accepts_msgpack(accept: str) -> bool:
+    msgpack_quality, json_quality = 0.0, 0.0
+    for item in accept.split(","):
+        media_type, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        media_type = media_type.strip().lower()
+        if media_type in MSGPACK_MEDIA_TYPES:
+            msgpack_quality = max(msgpack_quality, quality)
+        elif media_type == "application/json":
+            json_quality = max(json_quality, quality)
+    return msgpack_quality > 0 and msgpack_quality >= json_quality
+
+
+class NegotiatedResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if _use_msgpack.get():
+            self.media_type = MSGPACK_MEDIA_TYPE
+            return msgpack.packb(content, use_bin_type=True)
+        return super().render(content)
+
+
+class NegotiatedRoute(APIRoute):
+    def get_route_handler(self):
+        route_handler = super().get_route_handler()
+
+        async def negotiated_route_handler(request: Request) -> Response:
+            token = _use_msgpack.set(accepts_msgpack(request.headers.get("accept", "")))
+            try:
+                response = await route_handler(request)
+            finally:
+                _use_msgpack.reset(token)
+            # 响应内容随 Accept 变化，告知缓存
+            response.headers.add_vary_header("Accept")
+            return response
+
+        return negotiated_route_handler
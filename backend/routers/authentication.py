@@ -2,6 +2,7 @@
 #兼容 Swagger：OAuth2PasswordRequestForm 适配 Swagger 的登录表单，token_type: Bearer 符合 OAuth2 规范；
 #Google 登录：自动创建用户（无需手动注册），提升用户体验；
 #令牌刷新：生成新的访问 / 刷新令牌，延长登录态，避免频繁登录
+#审计字段：登录时间、刷新令牌时间只记入内存缓冲区（backend/audit.py），由后台任务批量写入，登录路径上没有额外写操作
 
 from datetime import timedelta
 from typing import TYPE_CHECKING
@@ -12,9 +13,10 @@ from fastapi.encoders import jsonable_encoder
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.audit import audit_buffer
 from backend.auth import create_access_token, create_refresh_token
 from backend.config import settings
-from backend.database import get_async_session
+from backend.database import get_async_session, get_read_session
 from backend.repositories.user_repo import UserRepository
 from backend.schemas import GoogleLoginSchema, RefreshTokenSchema
 
@@ -52,6 +54,7 @@ async def login(
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    audit_buffer.record("last_login", user.id)
     # 生成令牌
     access_token = create_access_token(subject=user.username)
     refresh_token = create_refresh_token(subject=user.username)
@@ -88,13 +91,11 @@ async def login_with_google(
     email: str = user_info.get("email", "").lower()
     if not email:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email was not provided")
-    # 检查用户是否存在：不存在则创建，存在则更新最后登录时间
+    # 检查用户是否存在：不存在则创建；最后登录时间由审计缓冲区延迟写入
     if not (user := await user_repo.get_user_by_email(email=email)):
         user: User = await user_repo.create_user_from_google_credentials(**user_info)
 
-    else:
-        # update last login for existing user
-        await user_repo.update_user_last_login(user=user)
+    audit_buffer.record("last_login", user.id)
     # 生成令牌
     access_token: str = create_access_token(email)
     refresh_token: str = create_refresh_token(email)
@@ -111,7 +112,7 @@ async def login_with_google(
 @router.post("/jwt/refresh/", summary="Create new access token for user")
 async def get_new_access_token_from_refresh_token(
     refresh_token_schema: RefreshTokenSchema,
-    db_session: AsyncSession = Depends(get_async_session),
+    db_session: AsyncSession = Depends(get_read_session),
 ):
     user_repo = UserRepository(db_session)
 
@@ -155,6 +156,7 @@ async def get_new_access_token_from_refresh_token(
             detail="User is not active",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    audit_buffer.record("last_token_refresh", user.id)
     # 生成新的访问令牌和刷新令牌
     new_access_token = create_access_token(
         username, expires_delta=timedelta(minutes=settings.NEW_ACCESS_TOKEN_EXPIRE_MINUTES)
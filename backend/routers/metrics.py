@@ -0,0 +1,27 @@
+#运行指标接口：查看当前进程的准入控制统计（各路由类别的并发、排队、拒绝计数）
+#统计为单个工作进程内的数据，多进程部署时每个进程分别统计；
+#访问控制：请求头 X-Metrics-Token 需与 METRICS_TOKEN 一致（未配置令牌时返回 404，令牌错误时返回 403）
+
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+
+from backend.config import settings
+from backend.middleware.admission import admission_controller
+
+
+# 校验指标令牌：未配置令牌时隐藏接口，与性能分析一样不接受空令牌
+async def verify_metrics_token(x_metrics_token: str | None = Header(default=None)) -> None:
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_metrics_token or not secrets.compare_digest(x_metrics_token, settings.METRICS_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid metrics token")
+
+
+router = APIRouter(prefix="/metrics", tags=["metrics"], dependencies=[Depends(verify_metrics_token)])
+
+
+# 准入控制指标接口：GET /metrics/admission/
+@router.get("/admission/")
+async def get_admission_metrics():
+    return admission_controller.snapshot()
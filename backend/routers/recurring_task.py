@@ -0,0 +1,107 @@
+#定义重复任务规则的 HTTP 接口，以及对规则某次发生的编辑/完成/删除
+#规则只存一行：GET /task/ 与 GET /task/range/ 在查询时按日期窗口展开，不预先生成每天的任务行；
+#按需落地：编辑/完成/删除某次发生时才写入一行 task（带 recurrence_id），之后即可按普通任务操作；
+#删除规则为软删除：已落地的任务保留，规则停止展开
+
+from datetime import date
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.auth import get_current_user, get_shard_read_session, get_shard_session
+from backend.models import RecurringTask, User
+from backend.repositories.recurring_task_repo import RecurringTaskRepository
+from backend.repositories.task_repo import TaskRepository
+from backend.responses import NegotiatedResponse, NegotiatedRoute
+from backend.schemas import (
+    CreateRecurringTaskSchema,
+    DisplayRecurringTaskSchema,
+    DisplayTaskSchema,
+    UpdateTaskSchema,
+)
+
+# 响应按 Accept 协商为 JSON 或 MessagePack（见 backend/responses.py）
+router = APIRouter(
+    prefix="/task/recurring",
+    tags=["task"],
+    route_class=NegotiatedRoute,
+    default_response_class=NegotiatedResponse,
+)
+
+
+# 查询当前用户的规则，不存在时返回404
+async def _get_rule_or_404(rule_id: int, db_session: AsyncSession, current_user: User) -> RecurringTask:
+    rule = await RecurringTaskRepository(db_session).get_rule_by_id(rule_id, current_user)
+    if not rule:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Recurring task with id {rule_id} not found",
+        )
+    return rule
+
+
+# 创建重复任务规则接口：POST /task/recurring/
+@router.post("/", response_model=DisplayRecurringTaskSchema)
+async def add_recurring_task(
+    rule_schema: CreateRecurringTaskSchema,
+    db_session: AsyncSession = Depends(get_shard_session),
+    current_user: User = Depends(get_current_user),
+):
+    recurring_task_repo = RecurringTaskRepository(db_session)
+    return await recurring_task_repo.create_rule(rule_schema, current_user)
+
+
+# 查询重复任务规则接口：GET /task/recurring/
+@router.get("/", response_model=list[DisplayRecurringTaskSchema])
+async def get_recurring_tasks(
+    db_session: AsyncSession = Depends(get_shard_read_session),
+    current_user: User = Depends(get_current_user),
+):
+    recurring_task_repo = RecurringTaskRepository(db_session)
+    return await recurring_task_repo.get_rules(current_user)
+
+
+# 删除重复任务规则接口：DELETE /task/recurring/{rule_id}/
+@router.delete("/{rule_id}/")
+async def delete_recurring_task(
+    rule_id: int,
+    db_session: AsyncSession = Depends(get_shard_session),
+    current_user: User = Depends(get_current_user),
+):
+    recurring_task_repo = RecurringTaskRepository(db_session)
+    if not await recurring_task_repo.delete_rule(rule_id, current_user):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Recurring task with id {rule_id} not found",
+        )
+
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+# 编辑/完成某次发生接口：PATCH /task/recurring/{rule_id}/occurrences/{occurrence_date}/
+@router.patch("/{rule_id}/occurrences/{occurrence_date}/", response_model=DisplayTaskSchema)
+async def update_occurrence(
+    rule_id: int,
+    occurrence_date: date,
+    update_task_schema: UpdateTaskSchema,
+    db_session: AsyncSession = Depends(get_shard_session),
+    current_user: User = Depends(get_current_user),
+):
+    rule = await _get_rule_or_404(rule_id, db_session, current_user)
+    task_repo = TaskRepository(db_session)
+    return await task_repo.materialize_occurrence(rule, occurrence_date, new_task=update_task_schema)
+
+
+# 删除某次发生接口：DELETE /task/recurring/{rule_id}/occurrences/{occurrence_date}/
+@router.delete("/{rule_id}/occurrences/{occurrence_date}/")
+async def delete_occurrence(
+    rule_id: int,
+    occurrence_date: date,
+    db_session: AsyncSession = Depends(get_shard_session),
+    current_user: User = Depends(get_current_user),
+):
+    rule = await _get_rule_or_404(rule_id, db_session, current_user)
+    task_repo = TaskRepository(db_session)
+    await task_repo.materialize_occurrence(rule, occurrence_date, skip=True)
+
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
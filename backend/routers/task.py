@@ -2,32 +2,49 @@
 #登录校验：所有接口依赖get_current_user，未登录无法访问；
 #权限二次校验：更新 / 删除任务时，额外校验task.user_id == current_user.id，防止越权；
 #响应模型：response_model=list[DisplayTaskSchema] 自动序列化任务列表，保证数据格式统一
+#分片会话：任务数据位于当前用户所在分片，读接口用 get_shard_read_session，写接口用 get_shard_session
+#请求合并：同一用户同一日期的并发 GET /task/ 共享一次查询（多标签页/多设备重连时避免重复查询）
 
 #!!!!!!注意看引入部分，各个操作都是引入其他的文件的模型进行配置
 
 from datetime import date
+from typing import Literal
 
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.auth import get_current_user
-from backend.database import get_async_session
+from backend.auth import get_current_user, get_shard_read_session, get_shard_session
+from backend.config import settings
+from backend.database import open_shard_read_session, should_read_primary
 from backend.models import User
-from backend.repositories.task_repo import TaskRepository
+from backend.repositories.stats_repo import StatsRepository
+from backend.repositories.sync_repo import CHANGE_KIND_RECURRING_TASK, CHANGE_KIND_TASK, SyncRepository
+from backend.repositories.task_repo import TaskRepository, TaskRow
+from backend.responses import NegotiatedResponse, NegotiatedRoute
 from backend.schemas import (
     CreateTaskSchema,
+    DisplayDatedTaskSchema,
     DisplayTaskSchema,
+    TaskChangesSchema,
+    TaskStatsSchema,
     UpdateTaskPrioritiesSchema,
     UpdateTaskSchema,
 )
-
-router = APIRouter(prefix="/task", tags=["task"])
+from backend.singleflight import SingleFlight
+
+# 响应按 Accept 协商为 JSON 或 MessagePack（见 backend/responses.py）
+router = APIRouter(
+    prefix="/task",
+    tags=["task"],
+    route_class=NegotiatedRoute,
+    default_response_class=NegotiatedResponse,
+)
 
 # 创建任务接口：POST /task/
 @router.post("/", response_model=DisplayTaskSchema)
 async def add_task(
     create_task_schema: CreateTaskSchema,
-    db_session: AsyncSession = Depends(get_async_session),
+    db_session: AsyncSession = Depends(get_shard_session),
     current_user: User = Depends(get_current_user),  # 登录校验
 ):
     task_repo = TaskRepository(db_session)
@@ -35,23 +52,126 @@ async def add_task(
     return task
 
 
+# 按日期查询任务的并发调用合并（key：(用户, 日期, 是否读主库)）
+_tasks_by_date_lookups: SingleFlight[list[TaskRow]] = SingleFlight()
+
+
 # 按日期查询任务接口：GET /task/
+#合并后的查询可能被多个请求共享，因此在查询内自行打开分片会话，而不是使用本请求的依赖会话
 @router.get("/", response_model=list[DisplayTaskSchema])
 async def get_tasks(
     selected_date: date,
-    db_session: AsyncSession = Depends(get_async_session),
+    request: Request,
     current_user: User = Depends(get_current_user),
 ):
+    async def load_tasks() -> list[TaskRow]:
+        async with open_shard_read_session(request, current_user.shard_id) as db_session:
+            task_repo = TaskRepository(db_session)
+            return await task_repo.get_tasks_by_date(selected_date, current_user, lean=True)
+
+    return await _tasks_by_date_lookups.do(
+        (current_user.id, selected_date, should_read_primary(request)),
+        load_tasks,
+    )
+
+
+# 按日期区间查询任务接口：GET /task/range/（包含区间内展开的重复任务）
+@router.get("/range/", response_model=list[DisplayDatedTaskSchema])
+async def get_tasks_in_range(
+    start_date: date,
+    end_date: date,
+    db_session: AsyncSession = Depends(get_shard_read_session),
+    current_user: User = Depends(get_current_user),
+):
+    if start_date > end_date or (end_date - start_date).days >= settings.MAX_TASK_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Date range must be ordered and span at most {settings.MAX_TASK_RANGE_DAYS} days",
+        )
     task_repo = TaskRepository(db_session)
-    tasks = await task_repo.get_tasks_by_date(selected_date, current_user)
+    tasks = await task_repo.get_tasks_by_range(start_date, end_date, current_user, lean=True)
     return tasks
 
 
+# 任务完成率统计接口：GET /task/stats/（读取增量维护的 task_daily_stat，不扫描 task 表；未落地的重复任务发生计为未完成）
+@router.get("/stats/", response_model=list[TaskStatsSchema])
+async def get_task_stats(
+    start_date: date,
+    end_date: date,
+    period: Literal["day", "week"] = "day",
+    db_session: AsyncSession = Depends(get_shard_read_session),
+    current_user: User = Depends(get_current_user),
+):
+    # 统计包含按规则展开的重复任务发生，区间限制与 GET /task/range/ 相同
+    if start_date > end_date or (end_date - start_date).days >= settings.MAX_TASK_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Date range must be ordered and span at most {settings.MAX_TASK_RANGE_DAYS} days",
+        )
+    stats_repo = StatsRepository(db_session)
+    if period == "week":
+        rows = await stats_repo.get_weekly_stats(start_date, end_date, current_user)
+    else:
+        rows = await stats_repo.get_daily_stats(start_date, end_date, current_user)
+
+    return [
+        TaskStatsSchema(
+            period_start=period_start,
+            total=total,
+            completed=completed,
+            completion_rate=completed / total if total else 0.0,
+        )
+        for period_start, total, completed in rows
+    ]
+
+
+# 解析同步游标 "<change_seq>-<实体类型>-<id>"（兼容旧版的 "<change_seq>-<id>"，即任务），格式错误返回422
+def _parse_sync_cursor(since: str) -> tuple[int, int, int]:
+    try:
+        parts = [int(part) for part in since.split("-")]
+        if len(parts) == 2:
+            parts.insert(1, CHANGE_KIND_TASK)
+        change_seq, kind, entity_id = parts
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid sync cursor {since!r}",
+        )
+    return change_seq, kind, entity_id
+
+
+# 增量同步接口：GET /task/changes/?since=<cursor>
+#不带 since 为初次同步（返回全部未删除的任务和重复任务规则）；之后携带上次响应的 cursor，
+#只返回此后新增/修改/删除（墓碑）的任务与规则；重复任务的具体发生由客户端按规则展开
+@router.get("/changes/", response_model=TaskChangesSchema)
+async def get_task_changes(
+    since: str | None = None,
+    db_session: AsyncSession = Depends(get_shard_read_session),
+    current_user: User = Depends(get_current_user),
+):
+    cursor = _parse_sync_cursor(since) if since else None
+    sync_repo = SyncRepository(db_session)
+    # 多取一条用于判断是否还有下一页
+    changes = await sync_repo.get_changes(current_user, cursor, limit=settings.SYNC_PAGE_SIZE + 1)
+    has_more = len(changes) > settings.SYNC_PAGE_SIZE
+    changes = changes[: settings.SYNC_PAGE_SIZE]
+
+    if changes:
+        kind, entity = changes[-1]
+        cursor = (entity.change_seq, kind, entity.id)
+    return TaskChangesSchema(
+        changes=[entity for kind, entity in changes if kind == CHANGE_KIND_TASK],
+        recurring_changes=[entity for kind, entity in changes if kind == CHANGE_KIND_RECURRING_TASK],
+        cursor="-".join(str(part) for part in cursor or (0, CHANGE_KIND_TASK, 0)),
+        has_more=has_more,
+    )
+
+
 # 批量更新优先级接口：PATCH /task/update-order/
 @router.patch("/update-order/")
 async def update_tasks_order(
     priorities_schema: UpdateTaskPrioritiesSchema,
-    db_session: AsyncSession = Depends(get_async_session),
+    db_session: AsyncSession = Depends(get_shard_session),
     current_user: User = Depends(get_current_user),
 ):
     task_repo = TaskRepository(db_session)
@@ -66,26 +186,32 @@ async def update_tasks_order(
 async def update_task(
     task_id: int,
     update_task_schema: UpdateTaskSchema,
-    db_session: AsyncSession = Depends(get_async_session),
+    db_session: AsyncSession = Depends(get_shard_session),
     current_user: User = Depends(get_current_user),
 ):
     task_repo = TaskRepository(db_session)
-    # 校验任务是否存在
-    task = await task_repo.get_task_by_id(task_id)
-
-    if not task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Task with id {task_id} not found",
-        )
-     # 校验任务归属
-    if not task.user_id == current_user.id:
+    # 一条 UPDATE ... RETURNING 完成更新（WHERE 中已包含归属校验）
+    updated_task = await task_repo.update_task(task_id, current_user.id, new_task=update_task_schema)
+
+    if not updated_task:
+        # 仅在更新失败时再查询一次，区分“不存在”与“不属于当前用户”
+        task = await task_repo.get_task_by_id(task_id)
+        # 校验任务是否存在（已归档的任务只读）
+        if not task:
+            if await task_repo.archive_repo.is_task_archived(task_id, current_user.id):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Task with id {task_id} is archived and read-only",
+                )
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Task with id {task_id} not found",
+            )
+        # 校验任务归属
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Task does not belong to the current user",
         )
-     # 更新任务
-    updated_task = await task_repo.update_task(task, new_task=update_task_schema)
 
     return updated_task
 
@@ -94,12 +220,17 @@ async def update_task(
 @router.delete("/{task_id}/")
 async def delete_task_by_id(
     task_id: str,
-    db_session: AsyncSession = Depends(get_async_session),
+    db_session: AsyncSession = Depends(get_shard_session),
     current_user: User = Depends(get_current_user),
 ):
     task_repo = TaskRepository(db_session)
      # 校验任务是否存在且归属当前用户
     if not await task_repo.delete_task(task_id, current_user.id):
+        if await task_repo.archive_repo.is_task_archived(task_id, current_user.id):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Task with id {task_id} is archived and read-only",
+            )
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"task with id {task_id} not found",
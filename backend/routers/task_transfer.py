@@ -0,0 +1,253 @@
+#定义任务备份/迁移接口：流式导出（NDJSON / CSV）与分块导入
+#流式导出：StreamingResponse 逐块输出，数据来自服务端游标的固定大小分块，内存占用恒定；
+#分块导入：逐行解析上传文件，每行经 ImportTaskSchema 校验，按批次以多行 INSERT 写入，全部成功后一次提交；
+#上传大小上限 IMPORT_MAX_BYTES：导入事务持有分片写锁，限制文件大小即限制持锁时长；
+#重复任务：NDJSON 为完整备份格式，先输出规则记录（"type": "recurring_task"，含已删除的发生日期），
+#已落地的发生以 recurrence_id 引用规则记录的 id；CSV 为表格格式，只包含任务行（不含规则）；
+#会话说明：导出的生成器在响应发送阶段执行，此时依赖注入的会话已关闭，因此在生成器内自行打开用户所在分片的只读会话
+
+import csv
+import io
+import json
+from collections.abc import AsyncIterator, Iterator
+from typing import TYPE_CHECKING, Literal
+
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.auth import get_current_user, get_shard_session
+from backend.config import settings
+from backend.database import shard_router
+from backend.models import RecurringTask, User
+from backend.repositories.recurring_task_repo import RecurringTaskRepository
+from backend.repositories.task_repo import TaskRepository
+from backend.schemas import ImportRecurringTaskSchema, ImportTaskSchema
+
+if TYPE_CHECKING:
+    from datetime import date
+
+router = APIRouter(prefix="/task", tags=["task"])
+
+# 导出/导入的字段顺序（CSV 表头）
+EXPORT_FIELDS = ["text", "priority", "completed", "posted_at", "created_at"]
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# NDJSON 中重复任务规则记录的类型标记（没有 type 字段的记录为任务）
+RECURRING_TASK_RECORD = "recurring_task"
+
+
+# 将重复任务规则编码为 NDJSON 文本
+def _encode_ndjson_rules(rules: list[RecurringTask], skipped_dates: dict[int, list]) -> str:
+    return "".join(
+        json.dumps(
+            {
+                "type": RECURRING_TASK_RECORD,
+                "id": rule.id,
+                "text": rule.text,
+                "priority": rule.priority,
+                "frequency": rule.frequency,
+                "interval": rule.interval,
+                "start_date": rule.start_date.isoformat(),
+                "end_date": rule.end_date.isoformat() if rule.end_date else None,
+                "occurrence_count": rule.occurrence_count,
+                "skipped_dates": [skipped_date.isoformat() for skipped_date in skipped_dates[rule.id]],
+            },
+            ensure_ascii=False,
+        )
+        + "\n"
+        for rule in rules
+    )
+
+
+# 将一批任务行编码为 NDJSON 文本；rule_ids 为已导出的规则，引用其他（已删除）规则的发生按普通任务导出
+def _encode_ndjson(rows, rule_ids: set[int]) -> str:
+    return "".join(
+        json.dumps(
+            {
+                "text": row.text,
+                "priority": row.priority,
+                "completed": row.completed,
+                "posted_at": row.posted_at.isoformat(),
+                "created_at": row.created_at.isoformat() if row.created_at else None,
+                "recurrence_id": row.recurrence_id if row.recurrence_id in rule_ids else None,
+            },
+            ensure_ascii=False,
+        )
+        + "\n"
+        for row in rows
+    )
+
+
+# 将一批任务行编码为 CSV 文本（不含表头）
+def _encode_csv(rows) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(
+            [
+                row.text,
+                row.priority,
+                row.completed,
+                row.posted_at.isoformat(),
+                row.created_at.isoformat() if row.created_at else "",
+            ],
+        )
+    return buffer.getvalue()
+
+
+# 导出生成器：每次从游标取一块、编码后立即输出
+#NDJSON 先输出全部重复任务规则（规则数量很少），再输出任务
+async def _export_chunks(current_user: User, export_format: str) -> AsyncIterator[str]:
+    async with shard_router.session_maker(current_user.shard_id, readonly=True)() as session:
+        if export_format == "csv":
+            yield ",".join(EXPORT_FIELDS) + "\r\n"
+            encode = _encode_csv
+        else:
+            recurring_task_repo = RecurringTaskRepository(session)
+            rules = await recurring_task_repo.get_rules(current_user)
+            rule_ids = {rule.id for rule in rules}
+            yield _encode_ndjson_rules(rules, await recurring_task_repo.get_skipped_dates(list(rule_ids)))
+
+            def encode(rows) -> str:
+                return _encode_ndjson(rows, rule_ids)
+
+        task_repo = TaskRepository(session)
+        async for rows in task_repo.stream_tasks(current_user, chunk_size=settings.EXPORT_CHUNK_SIZE):
+            yield encode(rows)
+
+
+# 逐行读取并解码上传文件，产出 (行号, 文本行)；文件已由 Starlette 落盘/缓存，按行读取不整体载入内存
+#逐行解码：非 UTF-8 内容能定位到具体行号（整体解码时错误位置与行号无关）
+def _iter_lines(upload: UploadFile) -> Iterator[tuple[int, str]]:
+    for line_number, raw_line in enumerate(upload.file, start=1):
+        try:
+            yield line_number, raw_line.decode("utf-8-sig" if line_number == 1 else "utf-8")
+        except UnicodeDecodeError as e:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail={"line": line_number, "errors": [f"Invalid UTF-8: {e.reason}"]},
+            )
+
+
+# 逐条解析上传文件，产出 (行号, 原始记录)
+def _iter_records(upload: UploadFile, import_format: str) -> Iterator[tuple[int, dict]]:
+    if import_format == "csv":
+        line_number = 0  # 最近读取的物理行号（csv 解析出错时 reader.line_num 可能尚未更新）
+
+        def lines() -> Iterator[str]:
+            nonlocal line_number
+            for line_number, line in _iter_lines(upload):
+                yield line
+
+        reader = csv.DictReader(lines())
+        try:
+            for record in reader:
+                yield line_number, record
+        except csv.Error as e:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail={"line": line_number, "errors": [f"Invalid CSV: {e}"]},
+            )
+        return
+
+    for line_number, line in _iter_lines(upload):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail={"line": line_number, "errors": [f"Invalid JSON: {e.msg}"]},
+            )
+        if not isinstance(record, dict):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail={"line": line_number, "errors": ["Each line must be a JSON object"]},
+            )
+        yield line_number, record
+
+
+# 流式导出接口：GET /task/export/?export_format=ndjson|csv
+@router.get("/export/")
+async def export_tasks(
+    export_format: Literal["ndjson", "csv"] = "ndjson",
+    current_user: User = Depends(get_current_user),
+):
+    return StreamingResponse(
+        _export_chunks(current_user, export_format),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="tasks.{export_format}"'},
+    )
+
+
+# 分块导入接口：POST /task/import/?import_format=ndjson|csv（multipart 文件上传）
+@router.post("/import/")
+async def import_tasks(
+    file: UploadFile = File(...),
+    import_format: Literal["ndjson", "csv"] = "ndjson",
+    db_session: AsyncSession = Depends(get_shard_session),
+    current_user: User = Depends(get_current_user),
+):
+    # 导入在一个事务内完成，期间持有分片写锁：限制上传大小，避免大文件长时间阻塞该分片的其他任务写入
+    if file.size is not None and file.size > settings.IMPORT_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Import file must not exceed {settings.IMPORT_MAX_BYTES} bytes",
+        )
+
+    task_repo = TaskRepository(db_session)
+    recurring_task_repo = RecurringTaskRepository(db_session)
+    imported = imported_rules = 0
+    chunk: list[ImportTaskSchema] = []
+    # 文件中规则记录的 id -> 新建规则；已占用的 (新规则 id, 日期)，同一发生只能落地一次
+    rules: dict[int, RecurringTask] = {}
+    occurrences: set[tuple[int, date]] = set()
+
+    for line_number, record in _iter_records(file, import_format):
+        try:
+            if record.get("type") == RECURRING_TASK_RECORD:
+                rule_schema = ImportRecurringTaskSchema.model_validate(record)
+            else:
+                task_schema = ImportTaskSchema.model_validate(record)
+        except ValidationError as e:
+            # 会话关闭时自动回滚，已写入的批次不会生效
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail={"line": line_number, "errors": e.errors(include_url=False, include_context=False)},
+            )
+
+        if record.get("type") == RECURRING_TASK_RECORD:
+            rule = await recurring_task_repo.import_rule(rule_schema, current_user)
+            await task_repo.bulk_skip_occurrences(rule, rule_schema.skipped_dates, current_user)
+            rules[rule_schema.id] = rule
+            occurrences.update((rule.id, skipped_date) for skipped_date in rule_schema.skipped_dates)
+            imported_rules += 1
+            continue
+
+        if task_schema.recurrence_id is not None:
+            rule = rules.get(task_schema.recurrence_id)
+            error = None
+            if rule is None:
+                error = f"Recurring task {task_schema.recurrence_id} is not defined before this line"
+            elif (rule.id, task_schema.posted_at) in occurrences:
+                error = f"Duplicate occurrence of recurring task {task_schema.recurrence_id} on {task_schema.posted_at}"
+            if error:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail={"line": line_number, "errors": [error]},
+                )
+            occurrences.add((rule.id, task_schema.posted_at))
+            task_schema = task_schema.model_copy(update={"recurrence_id": rule.id})
+
+        chunk.append(task_schema)
+        if len(chunk) >= settings.IMPORT_CHUNK_SIZE:
+            imported += await task_repo.bulk_create_tasks(chunk, current_user)
+            chunk = []
+
+    imported += await task_repo.bulk_create_tasks(chunk, current_user)
+    # 所有批次成功后统一提交：任何一行校验失败都不会留下部分导入的数据
+    await db_session.commit()
+
+    return {"imported": imported, "imported_recurring": imported_rules}
@@ -1,5 +1,5 @@
 #定义用户注册、删除的 HTTP 接口，处理请求参数校验和响应返回
-#唯一性校验：注册时校验用户名和邮箱，避免重复；
+#唯一性校验：注册时由数据库唯一约束保证用户名和邮箱不重复，冲突返回409；
 #响应模型：response_model=UserDisplay 自动隐藏密码，仅返回安全字段；
 #状态码：使用标准 HTTP 状态码（409 冲突、404 未找到、204 无内容）
 
@@ -17,19 +17,9 @@ router = APIRouter(prefix="/users", tags=["user"])
 @router.post("/register/", response_model=UserDisplay)
 async def add_user(user_schema: UserCreate, db_session: AsyncSession = Depends(get_async_session)):
     user_repo = UserRepository(db_session)
-    
-    # 校验用户名是否已存在
-    user = await user_repo.get_user_by_username(user_schema.username)
-    if user:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Username already exists")
-    
-    # 校验邮箱是否已存在
-    # checking if email already exists
-    user = await user_repo.get_user_by_email(user_schema.email)
-    if user:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already exists")
-    
+
     # 创建用户并返回（自动序列化为UserDisplay）
+    # 用户名/邮箱重复由数据库唯一约束检测，create_user 中映射为409（Username/Email already exists）
     return await user_repo.create_user(user_schema)
 
 
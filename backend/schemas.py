@@ -7,8 +7,11 @@
 #Pydantic 模型可以明确「前端该传什么数据」「后端会返回什么数据」，相当于前后端之间的「数据协议」，减少沟通成本和兼容问题
 
 from datetime import date, datetime
+from typing import Literal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
+
+from backend.recurrence import is_occurrence
 
 # 刷新令牌请求模型：校验refresh_token参数
 class RefreshTokenSchema(BaseModel):
@@ -22,6 +25,13 @@ class CreateTaskSchema(BaseModel):
     posted_at: date  # 关联日期（必填）
 
 
+# 导入任务模型：在创建任务校验的基础上，允许携带完成状态（用于备份恢复/迁移）
+#recurrence_id 为同一导入文件中重复任务规则记录的 id（已落地的发生），导入时映射为新规则的 id
+class ImportTaskSchema(CreateTaskSchema):
+    completed: bool = False
+    recurrence_id: int | None = None
+
+
 # 按日期查询任务请求模型：校验日期参数
 class TasksByDateSchema(BaseModel):
     date: date
@@ -42,17 +52,97 @@ class UpdateTaskPrioritiesSchema(BaseModel):
 
 
 # 任务响应模型：序列化任务数据返回前端
+#重复任务尚未落地的发生没有 id（为 None），通过 recurrence_id + 日期编辑/完成
 class DisplayTaskSchema(BaseModel):
-    id: int
+    id: int | None
     priority: int
     text: str
     completed: bool
     created_at: datetime
+    recurrence_id: int | None = None
      # 配置：支持从ORM模型（如Task）直接转换
     class Config:
         from_attributes = True
 
 
+# 日期区间查询的任务响应模型：额外返回任务所属日期
+class DisplayDatedTaskSchema(DisplayTaskSchema):
+    posted_at: date
+
+
+# 增量同步中的单条变更：is_deleted 为 True 时是墓碑，客户端应删除本地副本
+class TaskChangeSchema(DisplayDatedTaskSchema):
+    updated_at: datetime
+    is_deleted: bool
+    change_seq: int
+
+
+
+
+# 创建重复任务规则请求模型：end_date / occurrence_count 为可选的结束条件
+class CreateRecurringTaskSchema(BaseModel):
+    text: str
+    priority: int
+    frequency: Literal["daily", "weekly", "monthly"]
+    interval: int = Field(default=1, ge=1)
+    start_date: date
+    end_date: date | None = None
+    occurrence_count: int | None = Field(default=None, ge=1)
+
+    @model_validator(mode="after")
+    def check_end_date(self):
+        if self.end_date is not None and self.end_date < self.start_date:
+            raise ValueError("end_date must not be earlier than start_date")
+        return self
+
+
+# 导入重复任务规则模型（NDJSON 中 "type": "recurring_task" 的记录）：id 仅用于文件内任务记录的引用，
+#skipped_dates 为已删除的发生日期
+class ImportRecurringTaskSchema(CreateRecurringTaskSchema):
+    id: int
+    skipped_dates: list[date] = []
+
+    @model_validator(mode="after")
+    def check_skipped_dates(self):
+        for skipped_date in self.skipped_dates:
+            if not is_occurrence(self, skipped_date):
+                raise ValueError(f"{skipped_date} is not an occurrence of the recurring task")
+        return self
+
+
+# 重复任务规则响应模型
+class DisplayRecurringTaskSchema(CreateRecurringTaskSchema):
+    id: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# 增量同步中的重复任务规则变更：is_deleted 为 True 时是墓碑，客户端应删除规则并停止展开
+class RecurringTaskChangeSchema(DisplayRecurringTaskSchema):
+    updated_at: datetime
+    is_deleted: bool
+    change_seq: int
+
+
+# 增量同步响应模型：changes 为任务变更，recurring_changes 为重复任务规则变更；
+#cursor 用于下一次请求的 since 参数，has_more 为 True 时应立即继续拉取
+class TaskChangesSchema(BaseModel):
+    changes: list[TaskChangeSchema]
+    recurring_changes: list[RecurringTaskChangeSchema] = []
+    cursor: str
+    has_more: bool
+
+
+# 任务统计响应模型：period_start 为统计周期起点（按天为当天，按周为周一）
+class TaskStatsSchema(BaseModel):
+    period_start: date
+    total: int
+    completed: int
+    completion_rate: float  # 完成率（0~1），total 为 0 时为 0
+
+
 # 内部用户模型（未直接使用，预留）
 class User(BaseModel):
     user_id: str
@@ -0,0 +1,54 @@
+#单飞（single-flight）请求合并：同一进程内，相同 key 的并发读取共享一次正在执行的调用及其结果
+#场景：用户多标签页/多设备重连时同时发出相同的 GET /task/?selected_date=，只查询一次数据库；
+#错误传播：共享调用抛出的异常会传给所有等待者；
+#取消处理：单个等待者被取消（如客户端断开）不影响其他等待者，所有等待者都取消后才取消共享调用；
+#共享调用不能使用某个请求的依赖会话（该请求结束时会话会关闭），调用方应在 fn 内自行打开会话
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+
+# 一次正在执行的共享调用
+class _Call(Generic[T]):
+    def __init__(self, task: asyncio.Task[T]):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight(Generic[T]):
+    def __init__(self):
+        self._calls: dict[Hashable, _Call[T]] = {}
+
+    # 执行 fn 并返回结果；相同 key 已有调用在执行时，等待并共享它的结果
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._forget(key, call))
+
+        call.waiters += 1
+        try:
+            # shield：等待者被取消时不会连带取消共享调用
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    # 调用结束后移除（之后的请求重新查询，结果不会被缓存）
+    def _forget(self, key: Hashable, call: _Call[T]) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # 取走异常，避免所有等待者都已取消时出现 "exception was never retrieved" 警告
+        if not call.task.cancelled():
+            call.task.exception()
+
+    # 正在执行的共享调用数量
+    def __len__(self) -> int:
+        return len(self._calls)